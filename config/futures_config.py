@@ -1,18 +1,56 @@
 # config/futures_config.py
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict
 import yaml
 
+# 优先使用 libyaml 的 C 解析器，未编译 libyaml 时退回纯 Python 实现
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# 删除 ASCII 范围内所有非字母字符（数字、'.'、'-' 等），在 C 层完成
+_NON_ALPHA_DELETE = str.maketrans('', '', ''.join(
+    chr(c) for c in range(128) if not chr(c).isalpha()
+))
+
 
 class FuturesConfigError(Exception):
     """期货配置错误"""
     pass
 
 
+@dataclass
+class ContractSpec:
+    """单个合约成交时用到的费用常量，撮合热路径上按属性读取
+
+    保证金与手续费公式只在这里实现，FuturesConfig 的 calculate_* 均委托给它
+    """
+    # 手写 __slots__（dataclass(slots=True) 需要 Python 3.10+）
+    __slots__ = ('trading_unit', 'margin_rate', 'commission_rate', 'min_commission')
+    trading_unit: float
+    margin_rate: float
+    commission_rate: float
+    min_commission: float
+
+    def margin(self, price: float, quantity: float) -> float:
+        """保证金 = 价格 × 交易单位 × 手数 × 保证金率"""
+        contract_value = price * self.trading_unit * quantity
+        return contract_value * self.margin_rate
+
+    def commission(self, trade_value: float) -> float:
+        """手续费，不低于最低手续费"""
+        commission = trade_value * self.commission_rate
+        return commission if commission > self.min_commission else self.min_commission
+
+
 class FuturesConfig:
     def __init__(self, config_path: str = "config/futures_config.yaml"):
         self.config_path = Path(config_path)
         self.configs: Dict[str, dict] = {}
+        # 合约代码 -> 已校验的费用常量，首次计算后保证金/手续费只剩算术
+        self._contract_specs: Dict[str, ContractSpec] = {}
         
         # 直接加载配置，如果失败就报错
         self.load_config()
@@ -35,7 +73,7 @@ class FuturesConfig:
         
         try:
             with open(self.config_path, 'r', encoding='utf-8') as f:
-                loaded_configs = yaml.safe_load(f)
+                loaded_configs = yaml.load(f, Loader=_YamlLoader)
                 
             if not loaded_configs:
                 raise FuturesConfigError(f"配置文件为空: {self.config_path}")
@@ -47,10 +85,18 @@ class FuturesConfig:
         except Exception as e:
             raise FuturesConfigError(f"加载配置文件失败: {e}")
 
+    def reload(self):
+        """重新读取配置文件，共享该实例的调用方都会看到新配置"""
+        self.load_config()
+        self._contract_specs.clear()
+
     def get_config(self, symbol: str) -> dict:
         """获取品种配置"""
         # 提取基础品种代码（如 RB2310 -> RB）
-        base_symbol = ''.join(filter(str.isalpha, symbol))
+        base_symbol = symbol.translate(_NON_ALPHA_DELETE)
+        if not base_symbol.isalpha():
+            # 含非 ASCII 字符时退回逐字符过滤
+            base_symbol = ''.join(filter(str.isalpha, symbol))
         
         # 检查是否有该品种配置
         if base_symbol in self.configs:
@@ -65,29 +111,24 @@ class FuturesConfig:
     
     def calculate_margin(self, symbol: str, price: float, quantity: int) -> float:
         """计算保证金"""
-        config = self.get_config(symbol)
-        
-        # 验证必要字段
-        required_fields = ['trading_unit', 'margin_rate']
-        for field in required_fields:
-            if field not in config:
-                raise FuturesConfigError(f"配置中缺少必要字段 '{field}' for {symbol}")
-        
-        contract_value = price * config['trading_unit'] * quantity
-        return contract_value * config['margin_rate']
+        return self.get_contract_spec(symbol).margin(price, quantity)
     
     def calculate_commission(self, symbol: str, trade_value: float) -> float:
         """计算手续费"""
-        config = self.get_config(symbol)
-        
-        # 验证必要字段
-        required_fields = ['commission_rate', 'min_commission']
-        for field in required_fields:
-            if field not in config:
-                raise FuturesConfigError(f"配置中缺少必要字段 '{field}' for {symbol}")
-        
-        commission = trade_value * config['commission_rate']
-        return max(commission, config['min_commission'])
+        return self.get_contract_spec(symbol).commission(trade_value)
+    
+    def get_contract_spec(self, symbol: str) -> ContractSpec:
+        """合约的费用常量（缓存），reload 时失效"""
+        spec = self._contract_specs.get(symbol)
+        if spec is None:
+            config = self.get_config(symbol)
+            fields = ('trading_unit', 'margin_rate', 'commission_rate', 'min_commission')
+            for field in fields:
+                if field not in config:
+                    raise FuturesConfigError(f"配置中缺少必要字段 '{field}' for {symbol}")
+            spec = ContractSpec(*(config[field] for field in fields))
+            self._contract_specs[symbol] = spec
+        return spec
     
     def get_all_symbols(self) -> list:
         """获取所有已配置的品种代码"""
@@ -106,4 +147,17 @@ class FuturesConfig:
             # 验证所有品种
             for sym in self.configs.keys():
                 self.validate_config(sym)
-            return True
\ No newline at end of file
+            return True
+
+
+# 配置文件绝对路径 -> 已加载的实例，避免重复解析 YAML
+_INSTANCES: Dict[str, FuturesConfig] = {}
+
+
+def get_futures_config(config_path: str = "config/futures_config.yaml") -> FuturesConfig:
+    """获取共享的期货配置实例，同一配置文件只加载一次"""
+    key = str(Path(config_path).absolute())
+    instance = _INSTANCES.get(key)
+    if instance is None:
+        instance = _INSTANCES[key] = FuturesConfig(config_path)
+    return instance
@@ -3,11 +3,24 @@
 使用BacktestEngine的正确运行脚本
 """
 import argparse
+import json
 import sys
 import os
+import traceback
 import pandas as pd
 import numpy as np
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from datetime import datetime
+from enum import Enum
+from types import SimpleNamespace
+from typing import Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 添加项目路径
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -15,6 +28,8 @@ src_path = os.path.join(project_root, 'src')
 if src_path not in sys.path:
     sys.path.insert(0, src_path)
 
+from account.account import AccountHistory, PositionBook
+
 def parse_arguments():
     """解析命令行参数"""
     parser = argparse.ArgumentParser(
@@ -57,43 +72,97 @@ def parse_arguments():
     
     return parser.parse_args()
 
-def load_data(args):
+@dataclass(frozen=True)
+class RunConfig:
+    """解析后的运行参数（只读），组合开关在构造时算好"""
+    # 手写 __slots__（dataclass(slots=True) 需要 Python 3.10+）
+    __slots__ = (
+        'symbol', 'start', 'end', 'freq', 'capital', 'use_akshare', 'use_simulation',
+        'strategy', 'output', 'verbose', 'use_remote',
+    )
+    symbol: Tuple[str, ...]
+    start: str
+    end: str
+    freq: str
+    capital: float
+    use_akshare: bool
+    use_simulation: bool
+    strategy: str
+    output: Optional[str]
+    verbose: int
+    use_remote: bool  # 是否从 AkShare 拉取数据
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> 'RunConfig':
+        return cls(
+            symbol=tuple(args.symbol),
+            start=args.start,
+            end=args.end,
+            freq=args.freq,
+            capital=args.capital,
+            use_akshare=args.use_akshare,
+            use_simulation=args.use_simulation,
+            strategy=args.strategy,
+            output=args.output,
+            verbose=args.verbose,
+            use_remote=bool(args.use_akshare and not args.use_simulation),
+        )
+
+def load_data(cfg):
     """加载数据"""
     print("\n[1/4] 加载数据")
     print("-" * 40)
     
     data_dict = {}
+    remote_data = {}
     
-    for symbol in args.symbol:
-        df = None
-        
-        # 尝试AkShare
-        if args.use_akshare and not args.use_simulation:
-            try:
-                from data.akshare_feed import AkShareFeed
-                feed = AkShareFeed()
-                df = feed.get_kline(
-                    symbol=symbol,
-                    freq=args.freq,
-                    start=args.start,
-                    end=args.end
-                )
-                if df is not None and not df.empty:
-                    print(f"  ✓ {symbol}: {len(df)} 条 (AkShare)")
-                else:
-                    print(f"  ✗ {symbol}: AkShare数据为空")
-                    df = None
-            except Exception as e:
-                print(f"  ✗ {symbol}: AkShare失败 - {e}")
-                df = None
+    # 尝试AkShare：各品种的拉取互不依赖，并发发起网络请求
+    if cfg.use_remote:
+        try:
+            from data.akshare_feed import AkShareFeed
+            feed = AkShareFeed()
+        except Exception as e:
+            print(f"  ✗ AkShare不可用 - {e}")
+            feed = None
         
-        # 使用模拟数据
+        if feed is not None:
+            max_workers = min(16, len(cfg.symbol))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(
+                        feed.get_kline,
+                        symbol=symbol,
+                        freq=cfg.freq,
+                        start=cfg.start,
+                        end=cfg.end
+                    ): symbol
+                    for symbol in cfg.symbol
+                }
+                for future in as_completed(futures):
+                    symbol = futures[future]
+                    try:
+                        df = future.result()
+                    except Exception as e:
+                        print(f"  ✗ {symbol}: AkShare失败 - {e}")
+                        continue
+                    if df is not None and not df.empty:
+                        print(f"  ✓ {symbol}: {len(df)} 条 (AkShare)")
+                        remote_data[symbol] = df
+                    else:
+                        print(f"  ✗ {symbol}: AkShare数据为空")
+    
+    # 缺失的品种一次性批量生成模拟数据
+    missing = [symbol for symbol in cfg.symbol if symbol not in remote_data]
+    simulated = create_simulation_data(missing, cfg.start, cfg.end, cfg.freq) if missing else {}
+    
+    # 按命令行顺序组装
+    for symbol in cfg.symbol:
+        df = remote_data.get(symbol)
         if df is None:
-            df = create_simulation_data(symbol, args.start, args.end, args.freq)
+            df = simulated[symbol]
             print(f"  ✓ {symbol}: {len(df)} 条 (模拟数据)")
         
-        if df is not None:
-            data_dict[symbol] = df
+        data_dict[symbol] = df
     
     if not data_dict:
         print("错误: 没有加载到任何数据")
@@ -101,8 +170,8 @@ def load_data(args):
     
     return data_dict
 
-def create_simulation_data(symbol, start, end, freq):
-    """创建模拟数据"""
+def create_simulation_data(symbols, start, end, freq):
+    """批量创建模拟数据，所有品种共用同一时间索引，返回 {symbol: DataFrame}"""
     freq_map = {'1d': 'D', '1m': 'T', '5m': '5T', '15m': '15T', '30m': '30T', '60m': 'H'}
     freq_pandas = freq_map.get(freq, 'D')
     
@@ -111,31 +180,44 @@ def create_simulation_data(symbol, start, end, freq):
     except:
         dates = pd.date_range(start='2024-01-01', periods=100, freq=freq_pandas)
     
+    n_symbols = len(symbols)
     n_points = len(dates)
-    np.random.seed(42)
-    
+    rng = np.random.default_rng(42)
+
     # 根据不同品种设置基准价格
     base_prices = {
         'AAPL': 150, 'MSFT': 300, 'GOOGL': 100,
         'TSLA': 200, 'RB0': 3500, 'AG0': 5000,
     }
-    base_price = base_prices.get(symbol, 100)
-    
-    # 生成价格序列
-    returns = np.random.normal(0.0005, 0.02, n_points)
-    prices = base_price * np.exp(np.cumsum(returns))
-    
-    df = pd.DataFrame({
-        'open': prices * (1 + np.random.uniform(-0.01, 0.01, n_points)),
-        'high': prices * (1 + np.random.uniform(0, 0.02, n_points)),
-        'low': prices * (1 - np.random.uniform(0, 0.02, n_points)),
-        'close': prices,
-        'volume': np.random.randint(1000000, 10000000, n_points)
-    }, index=dates)
-    
-    return df
+    base_vec = np.array([base_prices.get(symbol, 100) for symbol in symbols], dtype=float)
+
+    # 所有品种的价格序列一次生成：(品种, 时间)，原地累加/取指数
+    prices = rng.normal(0.0005, 0.02, (n_symbols, n_points))
+    np.cumsum(prices, axis=1, out=prices)
+    np.exp(prices, out=prices)
+    prices *= base_vec[:, None]
+
+    # open/high/low 扰动按 (列, 品种, 时间) 一次生成并原地缩放
+    noise = rng.random((3, n_symbols, n_points))
+    noise *= np.array([0.02, 0.02, -0.02])[:, None, None]
+    noise += np.array([0.99, 1.0, 1.0])[:, None, None]
+    volumes = rng.integers(1000000, 10000000, (n_symbols, n_points))
+
+    # 按 (品种, 列, 时间) 存放，每个品种的 4 列是连续内存块，
+    # 转置后正好是 pandas 的列存布局，可直接复用而不复制
+    ohlc = np.empty((n_symbols, 4, n_points))
+    np.multiply(noise.transpose(1, 0, 2), prices[:, None, :], out=ohlc[:, :3])
+    ohlc[:, 3] = prices
 
-def setup_engine(args, data_dict):
+    data = {}
+    for k, symbol in enumerate(symbols):
+        df = pd.DataFrame(ohlc[k].T, index=dates, columns=['open', 'high', 'low', 'close'], copy=False)
+        df['volume'] = volumes[k]
+        data[symbol] = df
+
+    return data
+
+def setup_engine(cfg, data_dict):
     """设置引擎"""
     print("\n[2/4] 设置回测引擎")
     print("-" * 40)
@@ -144,8 +226,8 @@ def setup_engine(args, data_dict):
         from core.engine import BacktestEngine
         
         # 创建引擎
-        engine = BacktestEngine(initial_capital=args.capital)
-        print(f"引擎创建: 初始资金 ¥{args.capital:,.2f}")
+        engine = BacktestEngine(initial_capital=cfg.capital)
+        print(f"引擎创建: 初始资金 ¥{cfg.capital:,.2f}")
         
         # 添加数据到引擎
         for symbol, df in data_dict.items():
@@ -156,27 +238,26 @@ def setup_engine(args, data_dict):
         
     except Exception as e:
         print(f"设置引擎失败: {e}")
-        import traceback
         traceback.print_exc()
         return None
 
-def add_strategy_to_engine(engine, args):
+def add_strategy_to_engine(engine, cfg):
     """添加策略到引擎"""
     print("\n[3/4] 添加策略")
     print("-" * 40)
     
     try:
         # 如果指定期货策略，使用策略默认参数
-        if args.strategy == 'futures_dual_ma':
+        if cfg.strategy == 'futures_dual_ma':
             from strategy.futures_dual_ma import FuturesDualMaStrategy
             strategy_cls = FuturesDualMaStrategy
             strategy_params = {}
-        elif args.strategy == 'range_break_strategy':
+        elif cfg.strategy == 'range_break_strategy':
             # 股票策略
             from strategy.range_break_strategy import RangeBreakStrategy
             strategy_cls = RangeBreakStrategy
             strategy_params = {}
-        elif args.strategy == 'range_break_strategy_v2':
+        elif cfg.strategy == 'range_break_strategy_v2':
             # 股票策略
             from strategy.range_break_strategy_v2 import RangeBreakStrategyV2
             strategy_cls = RangeBreakStrategyV2
@@ -189,24 +270,21 @@ def add_strategy_to_engine(engine, args):
         
     except Exception as e:
         print(f"添加策略失败: {e}")
-        import traceback
         traceback.print_exc()
         return False
 
-def run_backtest(engine, args):
+def run_backtest(engine, cfg):
     """运行回测"""
     print("\n[4/4] 运行回测")
     print("-" * 40)
     
     try:
         # 转换日期字符串为datetime
-        from datetime import datetime as dt
-        
-        start_date = dt.strptime(args.start, '%Y-%m-%d') if args.start else None
-        end_date = dt.strptime(args.end, '%Y-%m-%d') if args.end else None
+        start_date = datetime.strptime(cfg.start, '%Y-%m-%d') if cfg.start else None
+        end_date = datetime.strptime(cfg.end, '%Y-%m-%d') if cfg.end else None
         
         # 运行引擎
-        print(f"开始回测: {args.start} 到 {args.end}")
+        print(f"开始回测: {cfg.start} 到 {cfg.end}")
         engine.run(start_date=start_date, end_date=end_date)
         
         # 获取结果
@@ -223,11 +301,10 @@ def run_backtest(engine, args):
         
     except Exception as e:
         print(f"回测运行失败: {e}")
-        import traceback
         traceback.print_exc()
         return None
 
-def print_results(results, args):
+def print_results(results, cfg):
     """打印结果"""
     if not results:
         print("无结果")
@@ -241,8 +318,8 @@ def print_results(results, args):
     if 'performance' in results:
         perf = results['performance']
         print(f"📊 性能指标:")
-        print(f"   初始资金:   ¥{perf.get('initial_capital', args.capital):>12,.2f}")
-        print(f"   最终资产:   ¥{perf.get('final_assets', args.capital):>12,.2f}")
+        print(f"   初始资金:   ¥{perf.get('initial_capital', cfg.capital):>12,.2f}")
+        print(f"   最终资产:   ¥{perf.get('final_assets', cfg.capital):>12,.2f}")
         print(f"   总收益率:   {perf.get('total_return', 0):>12.2%}")
         print(f"   交易次数:   {perf.get('total_trades', 0):>12}")
         print(f"   胜率:       {perf.get('win_rate', 0):>12.2%}")
@@ -251,48 +328,50 @@ def print_results(results, args):
     # 最终账户 - 只打印一次
     if 'final_account' in results:
         account = results['final_account']
+        # 统一成属性访问，后面直接读字段；字典缺少的字段按默认值补齐
+        if isinstance(account, dict):
+            account = SimpleNamespace(**{
+                'total_assets': cfg.capital, 'cash': cfg.capital, 'realized_pnl': 0.0, **account
+            })
         print(f"\n💼 最终账户:")
-        print(f"   总资产:     ¥{getattr(account, 'total_assets', args.capital):>12,.2f}")
-        cash = getattr(account, 'cash', args.capital)
-        print(f"   现金:       ¥{cash:>12,.2f}")
-
-        # 只打印一次盈亏
-        if hasattr(account, 'realized_pnl'):
-            print(f"   已实现盈亏: ¥{getattr(account, 'realized_pnl', 0):>12,.2f}")
+        print(f"   总资产:     ¥{account.total_assets:>12,.2f}")
+        print(f"   现金:       ¥{account.cash:>12,.2f}")
+        print(f"   已实现盈亏: ¥{account.realized_pnl:>12,.2f}")
 
         # 持仓信息
-        positions = getattr(account, 'positions', {})
+        positions = getattr(account, 'positions', None)
         if positions:
-            print(f"\n📦 持仓:")
+            lines = []
             for symbol, lots in positions.items():
-                total_qty = 0.0
-                total_value = 0.0
-                if isinstance(lots, list):
-                    for lot in lots:
-                        total_qty += getattr(lot, 'quantity', 0.0)
-                        total_value += getattr(lot, 'market_value', 0.0)
+                if isinstance(lots, PositionBook):
+                    total_qty = lots.net_quantity()
+                    total_value = lots.update(lots.last_price)[0] if lots.last_price is not None else 0.0
                 elif isinstance(lots, dict):
                     total_qty = lots.get('quantity', 0.0)
                     total_value = lots.get('market_value', 0.0)
+                else:
+                    total_qty = sum(lot.quantity for lot in lots)
+                    total_value = sum(lot.market_value for lot in lots)
 
                 if total_qty != 0:
-                    print(f"   {symbol}: {total_qty:>8.2f} 股/手, 市值: ¥{total_value:>10,.2f}")
+                    lines.append(f"   {symbol}: {total_qty:>8.2f} 股/手, 市值: ¥{total_value:>10,.2f}")
+            print(f"\n📦 持仓:")
+            if lines:
+                print("\n".join(lines))
 
     # 交易记录 - 只打印一次
     if 'trades' in results:
         trades = results['trades']
         if trades:
             print(f"\n💹 交易记录: {len(trades)} 笔")
-            # 显示所有交易
+            # 显示所有交易，拼接后一次输出
+            lines = []
             for i, trade in enumerate(trades, 1):
-                side = getattr(trade, 'side', 'N/A')
-                if hasattr(side, 'value'):
-                    side = side.value
-                timestamp = getattr(trade, 'timestamp', None)
-                if timestamp:
-                    time_str = timestamp.strftime('%Y-%m-%d %H:%M:%S')
-                print(f"   {i:2d}. [{time_str}] {trade.symbol} {side} {getattr(trade, 'quantity', 0):.2f} " +
-                      f"@ ¥{getattr(trade, 'price', 0):.2f}")
+                side = trade.side.value if hasattr(trade.side, 'value') else trade.side
+                time_str = trade.timestamp.strftime('%Y-%m-%d %H:%M:%S') if trade.timestamp else ''
+                lines.append(f"   {i:2d}. [{time_str}] {trade.symbol} {side} {trade.quantity:.2f} "
+                             f"@ ¥{trade.price:.2f}")
+            print("\n".join(lines))
     
     print("=" * 60)
 
@@ -302,7 +381,6 @@ def save_results(results, output_dir, initial_capital=100000.0):
         return
     
     try:
-        import json
         os.makedirs(output_dir, exist_ok=True)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
@@ -314,24 +392,47 @@ def save_results(results, output_dir, initial_capital=100000.0):
         json_file = os.path.join(result_dir, f'engine_backtest_{timestamp}.json')
         
         def default_serializer(obj):
+            if isinstance(obj, (PositionBook, AccountHistory)):
+                return list(obj)
+            if isinstance(obj, Mapping):
+                return dict(obj)
+            # 时间和枚举需先于 __dict__ 判断，否则会被序列化为空对象；枚举与 orjson 一致输出取值
+            if isinstance(obj, (datetime, pd.Timestamp)):
+                return obj.isoformat()
+            if isinstance(obj, Enum):
+                return obj.value
             if hasattr(obj, '__dict__'):
                 return {k: v for k, v in obj.__dict__.items() 
                        if not k.startswith('_') and not callable(v)}
-            elif isinstance(obj, (datetime, pd.Timestamp)):
-                return obj.isoformat()
+            if hasattr(obj, '__slots__'):
+                # Position / AccountInfo / Order / Trade 使用 __slots__，没有 __dict__
+                return {k: getattr(obj, k) for k in obj.__slots__ if not k.startswith('_')}
             elif hasattr(obj, 'name'):
                 return obj.name
             return str(obj)
         
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, default=default_serializer)
+        if orjson is not None:
+            # orjson 原生处理 dataclass/datetime/numpy，回调只剩少数自定义对象
+            with open(json_file, 'wb') as f:
+                f.write(orjson.dumps(
+                    results,
+                    default=default_serializer,
+                    option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+                ))
+        else:
+            with open(json_file, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, default=default_serializer)
         
         print(f"\n💾 结果保存到: {json_file}")
         
         # CSV文件（账户历史）
-        if 'account_history' in results and results['account_history']:
+        account_history = results.get('account_history')
+        if account_history:
             csv_file = os.path.join(result_dir, f'account_history_{timestamp}.csv')
-            df = pd.DataFrame(results['account_history'])
+            if isinstance(account_history, AccountHistory):
+                df = account_history.to_frame()
+            else:
+                df = pd.DataFrame(account_history)
             df.to_csv(csv_file, index=False)
             print(f"💾 账户历史: {csv_file}")
         
@@ -339,7 +440,6 @@ def save_results(results, output_dir, initial_capital=100000.0):
         try:
             from analysis.performance_analyzer import PerformanceAnalyzer
             from analysis.visualizer import BacktestVisualizer
-            import numpy as np
             
             account_history = results.get('account_history', [])
             trades = results.get('trades', [])
@@ -353,8 +453,10 @@ def save_results(results, output_dir, initial_capital=100000.0):
                     trades
                 )
                 daily_returns = analyzer.calculate_daily_returns()
+                running_max = analyzer.calculate_running_max()
             else:
                 daily_returns = np.array([])
+                running_max = None
             
             # 生成图表
             visualizer = BacktestVisualizer(result_dir)
@@ -364,7 +466,8 @@ def save_results(results, output_dir, initial_capital=100000.0):
                 account_history,
                 daily_returns,
                 performance,
-                timestamp=chart_timestamp
+                timestamp=chart_timestamp,
+                running_max=running_max
             )
             
             print(f"\n📊 图表已生成:")
@@ -374,18 +477,17 @@ def save_results(results, output_dir, initial_capital=100000.0):
                     
         except Exception as e:
             print(f"图表生成失败: {e}")
-            import traceback
             traceback.print_exc()
             
     except Exception as e:
         print(f"保存失败: {e}")
-        import traceback
         traceback.print_exc()
         
 def main():
     """主函数"""
     # 解析参数
     args = parse_arguments()
+    cfg = RunConfig.from_args(args)
 
     # =========== 添加参数打印 ===========
     print("=" * 70)
@@ -405,43 +507,43 @@ def main():
     print("QuantCode 回测系统 (BacktestEngine)")
     print("=" * 70)
     print(f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"品种: {', '.join(args.symbol)}")
-    print(f"策略: {args.strategy}")
-    print(f"数据: {'AkShare' if args.use_akshare else '模拟数据'}")
+    print(f"品种: {', '.join(cfg.symbol)}")
+    print(f"策略: {cfg.strategy}")
+    print(f"数据: {'AkShare' if cfg.use_akshare else '模拟数据'}")
     print("=" * 70)
     
     try:
         # 1. 加载数据
-        data_dict = load_data(args)
+        data_dict = load_data(cfg)
         if not data_dict:
             return
         
         # 2. 设置引擎
-        engine = setup_engine(args, data_dict)
+        engine = setup_engine(cfg, data_dict)
         if not engine:
             return
         
         # 3. 添加策略
-        if not add_strategy_to_engine(engine, args):
+        if not add_strategy_to_engine(engine, cfg):
             return
         
         # 4. 运行回测
-        results = run_backtest(engine, args)
+        results = run_backtest(engine, cfg)
         
         if results:
             # 5. 打印结果
-            print_results(results, args)
+            print_results(results, cfg)
             
             # 6. 保存结果
-            if args.output:
-                save_results(results, args.output, args.capital)
+            if cfg.output:
+                save_results(results, cfg.output, cfg.capital)
             else:
                 try:
                     save = input("\n是否保存结果到data/results文件夹？(y/n): ").strip().lower()
                     if save == 'y':
                         results_dir = os.path.join('data', 'results')
                         os.makedirs(results_dir, exist_ok=True)
-                        save_results(results, results_dir, args.capital)
+                        save_results(results, results_dir, cfg.capital)
                 except:
                     pass
             
@@ -451,8 +553,7 @@ def main():
         print("\n\n⚠️ 用户中断")
     except Exception as e:
         print(f"\n❌ 错误: {e}")
-        import traceback
-        if args.verbose >= 1:
+        if cfg.verbose >= 1:
             traceback.print_exc()
 
 if __name__ == "__main__":
@@ -1,10 +1,17 @@
 # src/account/account.py
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Mapping, Optional, Set, Tuple
 from dataclasses import dataclass
 from datetime import datetime
+from operator import attrgetter
+from types import MappingProxyType
+import numpy as np
+import pandas as pd
 
-@dataclass
 class Position:
+    """单个持仓批次"""
+    __slots__ = ('symbol', 'quantity', 'entry_price', 'trading_unit', 'locked_margin',
+                 'market_value', 'unrealized_pnl')
+
     def __init__(self, symbol: str, quantity: float, entry_price: float, trading_unit: int = 1, locked_margin: float = 0.0):
         self.symbol = symbol
         self.quantity = quantity
@@ -16,44 +23,342 @@ class Position:
 
     def update(self, current_price: float):
         """更新持仓信息"""
+        # 平仓至 0 的批次会从持仓簿删除，这里无需再判断数量为 0
         self.market_value = abs(self.quantity) * self.trading_unit * current_price
-        if self.quantity != 0:
-            current_value = self.quantity * self.trading_unit * current_price
-            cost = self.quantity * self.trading_unit * self.entry_price
-            self.unrealized_pnl = current_value - cost
-        else:
-            self.unrealized_pnl = 0.0
+        current_value = self.quantity * self.trading_unit * current_price
+        cost = self.quantity * self.trading_unit * self.entry_price
+        self.unrealized_pnl = current_value - cost
+
+
+class PositionBook:
+    """单个品种的持仓批次（按列存储）
+
+    各批次的数量、开仓价、交易单位、锁定保证金分别存放在连续的 numpy 数组中，
+    估值时整列计算；只有遍历时才按需构造 Position 视图。
+    """
+
+    def __init__(self, symbol: str, capacity: int = 4):
+        self.symbol = symbol
+        self.n = 0
+        self.quantity = np.zeros(capacity)
+        self.entry_price = np.zeros(capacity)
+        self.trading_unit = np.zeros(capacity)
+        self.locked_margin = np.zeros(capacity)
+        self.last_price: Optional[float] = None
+        # 净持仓缓存；追加批次或经 keep 改写后置空，下次读取时重算
+        self._net: Optional[float] = None
+
+    def _grow(self):
+        capacity = max(4, len(self.quantity) * 2)
+        for name in ('quantity', 'entry_price', 'trading_unit', 'locked_margin'):
+            old = getattr(self, name)
+            new = np.zeros(capacity)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def append(self, quantity: float, entry_price: float, trading_unit: float, locked_margin: float):
+        """追加一个开仓批次"""
+        if self.n == len(self.quantity):
+            self._grow()
+        i = self.n
+        self.quantity[i] = quantity
+        self.entry_price[i] = entry_price
+        self.trading_unit[i] = trading_unit
+        self.locked_margin[i] = locked_margin
+        self.n += 1
+        self._net = None
+
+    def keep(self, mask: np.ndarray):
+        """只保留 mask 为真的批次（保持开仓顺序），一次布尔索引完成压缩
+
+        直接改写过 quantity 列的调用方也需调用本方法，以使净持仓缓存失效
+        """
+        self._net = None
+        n = self.n
+        kept = int(mask.sum())
+        if kept == n:
+            return
+        for col in (self.quantity, self.entry_price, self.trading_unit, self.locked_margin):
+            col[:kept] = col[:n][mask]
+            col[kept:n] = 0.0
+        self.n = kept
+
+    def close(self, sign: float, quantity: float, price: float, trading_unit: float) -> Tuple[float, float]:
+        """
+        按开仓顺序（先开先平）平掉 sign 方向（1 多头 / -1 空头）的批次
+
+        按平仓比例释放各批次的锁定保证金，平完的批次移出持仓簿。
+        返回 (已实现盈亏, 未能平掉的数量)
+        """
+        n = self.n
+        lot_qty = self.quantity[:n]
+        entry_price = self.entry_price[:n]
+        locked_margin = self.locked_margin[:n]
+
+        available = np.where(lot_qty * sign > 0, np.abs(lot_qty), 0.0)
+
+        # 按开仓顺序一次分配各批次的平仓数量
+        closed_before = np.cumsum(available) - available
+        close_qty = np.minimum(available, np.maximum(quantity - closed_before, 0.0))
+        touched = close_qty > 0
+        if not touched.any():
+            return 0.0, quantity
+
+        long_lot = lot_qty[touched] > 0
+        closed = close_qty[touched]
+        entry = entry_price[touched]
+        pnl = np.where(long_lot, price - entry, entry - price) * closed * trading_unit
+        realized_pnl = float(pnl.sum())
+
+        # 按平仓比例释放锁定保证金
+        release_ratio = closed / available[touched]
+        locked_margin[touched] = np.maximum(locked_margin[touched] * (1 - release_ratio), 0.0)
+
+        new_qty = available[touched] - closed
+        lot_qty[touched] = np.where(long_lot, new_qty, -new_qty)
+
+        # 平完的批次一次性移除（同时使净持仓缓存失效）
+        self.keep(lot_qty != 0)
+        return realized_pnl, quantity - closed.sum()
+
+    def net_quantity(self) -> float:
+        """净持仓（多为正，空为负），两次变动之间只求和一次"""
+        if self._net is None:
+            self._net = float(self.quantity[:self.n].sum())
+        return self._net
+
+    def total_margin(self) -> float:
+        """该品种全部批次占用的保证金"""
+        return float(self.locked_margin[:self.n].sum())
+
+    def update(self, current_price: float) -> Tuple[float, float]:
+        """按最新价整列估值，返回 (持仓市值, 浮动盈亏)"""
+        self.last_price = current_price
+        n = self.n
+        q = self.quantity[:n]
+        u = self.trading_unit[:n]
+        # 市值 = Σ|q·u| × 价格；浮盈 = (q·u) 与 (价格 - 开仓价) 的点积
+        qu = q * u
+        market_value = np.abs(qu).sum() * current_price
+        unrealized_pnl = qu.dot(current_price - self.entry_price[:n])
+        return float(market_value), float(unrealized_pnl)
+
+    def _view(self, i: int) -> Position:
+        lot = Position(
+            symbol=self.symbol,
+            quantity=float(self.quantity[i]),
+            entry_price=float(self.entry_price[i]),
+            trading_unit=float(self.trading_unit[i]),
+            locked_margin=float(self.locked_margin[i]),
+        )
+        if self.last_price is not None:
+            lot.update(self.last_price)
+        return lot
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, index: int) -> Position:
+        if index < 0:
+            index += self.n
+        if not 0 <= index < self.n:
+            raise IndexError(index)
+        return self._view(index)
+
+    def __iter__(self) -> Iterator[Position]:
+        for i in range(self.n):
+            yield self._view(i)
+
 
+# to_dict 的字段顺序固定，用 attrgetter 一次取出全部字段
+_ACCOUNT_INFO_KEYS = (
+    'total_assets', 'cash', 'market_value', 'total_pnl',
+    'unrealized_pnl', 'realized_pnl', 'timestamp',
+)
+_get_account_info_values = attrgetter(*_ACCOUNT_INFO_KEYS)
 
-@dataclass
+
+# 手写 __slots__（dataclass(slots=True) 需要 Python 3.10+），默认值写在 __init__ 参数里
+@dataclass(init=False)
 class AccountInfo:
     """账户信息（只读视图）"""
-    total_assets: float = 0.0
-    cash: float = 0.0
-    market_value: float = 0.0
-    total_pnl: float = 0.0
-    unrealized_pnl: float = 0.0
-    realized_pnl: float = 0.0
-    positions: Dict[str, List[Position]] = None
-    timestamp: datetime = None
+    __slots__ = (
+        'total_assets', 'cash', 'market_value', 'total_pnl',
+        'unrealized_pnl', 'realized_pnl', 'positions', 'timestamp',
+    )
+    total_assets: float
+    cash: float
+    market_value: float
+    total_pnl: float
+    unrealized_pnl: float
+    realized_pnl: float
+    positions: Mapping[str, PositionBook]
+    timestamp: datetime
     
-    def __post_init__(self):
-        if self.positions is None:
-            self.positions = {}
-        if self.timestamp is None:
-            self.timestamp = datetime.now()
+    def __init__(
+        self,
+        total_assets: float = 0.0,
+        cash: float = 0.0,
+        market_value: float = 0.0,
+        total_pnl: float = 0.0,
+        unrealized_pnl: float = 0.0,
+        realized_pnl: float = 0.0,
+        positions: Optional[Mapping[str, PositionBook]] = None,
+        timestamp: Optional[datetime] = None,
+    ):
+        self.total_assets = total_assets
+        self.cash = cash
+        self.market_value = market_value
+        self.total_pnl = total_pnl
+        self.unrealized_pnl = unrealized_pnl
+        self.realized_pnl = realized_pnl
+        self.positions = {} if positions is None else positions
+        self.timestamp = datetime.now() if timestamp is None else timestamp
     
     def to_dict(self) -> Dict:
         """转换为字典"""
-        return {
-            'total_assets': self.total_assets,
-            'cash': self.cash,
-            'market_value': self.market_value,
-            'total_pnl': self.total_pnl,
-            'unrealized_pnl': self.unrealized_pnl,
-            'realized_pnl': self.realized_pnl,
-            'timestamp': self.timestamp
-        }
+        return dict(zip(_ACCOUNT_INFO_KEYS, _get_account_info_values(self)))
+
+    def snapshot(self) -> 'AccountInfo':
+        """生成脱离账户的快照（持仓展开为独立的 Position 列表）"""
+        return AccountInfo(
+            total_assets=self.total_assets,
+            cash=self.cash,
+            market_value=self.market_value,
+            total_pnl=self.total_pnl,
+            unrealized_pnl=self.unrealized_pnl,
+            realized_pnl=self.realized_pnl,
+            positions={symbol: list(lots) for symbol, lots in self.positions.items()},
+            timestamp=self.timestamp
+        )
+
+
+def _to_datetime64(timestamp) -> np.datetime64:
+    """转为无时区的 datetime64，带时区的时间先统一换算到 UTC"""
+    ts = pd.Timestamp(timestamp)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(None)
+    return ts.to_datetime64()
+
+
+class AccountHistory:
+    """账户历史（按列存储）
+
+    每个 bar 按下标写入预分配的 numpy 列，避免逐 bar 构造字典；
+    仍支持按下标/迭代取出字典形式的单条记录，兼容旧的 List[Dict] 用法。
+    写入时顺带维护净值峰值和最大回撤，分析时无需再扫描整列。
+    回撤只相对正的峰值计算：净值从未为正之前最大回撤记为 0；
+    出现正峰值后净值跌到 0 或负数时，回撤为 100% 或更大。
+    """
+
+    FIELDS = ('total_assets', 'cash', 'market_value', 'realized_pnl', 'unrealized_pnl')
+
+    def __init__(self, capacity: int = 0):
+        self.n = 0
+        self.timestamp = np.empty(capacity, dtype='datetime64[ns]')
+        for name in self.FIELDS:
+            setattr(self, name, np.empty(capacity))
+        self.peak = -np.inf
+        self.max_drawdown = 0.0
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> 'AccountHistory':
+        """由旧的 List[Dict] 形式构造，缺失的数值记为 NaN、时间记为 NaT"""
+        n = len(records)
+        history = cls(n)
+        history.timestamp[:] = np.array([_to_datetime64(r.get('timestamp')) for r in records], dtype='datetime64[ns]')
+        for name in cls.FIELDS:
+            getattr(history, name)[:] = np.fromiter(
+                (r.get(name, np.nan) for r in records), dtype=np.float64, count=n
+            )
+        history.n = n
+        history.refresh_drawdown()
+        return history
+
+    def refresh_drawdown(self):
+        """按现有 total_assets 列重新计算峰值和最大回撤（整列被外部修改后调用）"""
+        equity = self.total_assets[:self.n]
+        if not len(equity):
+            self.peak = -np.inf
+            self.max_drawdown = 0.0
+            return
+        running_max = np.maximum.accumulate(equity)
+        self.peak = float(running_max[-1])
+        # 与 record 的在线更新一致，只统计峰值为正的位置
+        positive = running_max > 0
+        if positive.all():
+            self.max_drawdown = float(1.0 - (equity / running_max).min())
+        elif positive.any():
+            self.max_drawdown = float(1.0 - (equity[positive] / running_max[positive]).min())
+        else:
+            self.max_drawdown = 0.0
+
+    def reserve(self, capacity: int):
+        """确保至少能容纳 capacity 条记录"""
+        if capacity <= len(self.timestamp):
+            return
+        for name in ('timestamp',) + self.FIELDS:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def record(self, timestamp: datetime, account_info: AccountInfo):
+        """追加一条记录"""
+        i = self.n
+        if i == len(self.timestamp):
+            self.reserve(max(16, i * 2))
+        self.timestamp[i] = _to_datetime64(timestamp)
+        total_assets = account_info.total_assets
+        self.total_assets[i] = total_assets
+        # 在线更新峰值与最大回撤（峰值不为正时不计回撤，见类说明）
+        if total_assets > self.peak:
+            self.peak = total_assets
+        elif self.peak > 0:
+            drawdown = 1.0 - total_assets / self.peak
+            if drawdown > self.max_drawdown:
+                self.max_drawdown = drawdown
+        self.cash[i] = account_info.cash
+        self.market_value[i] = account_info.market_value
+        self.realized_pnl[i] = account_info.realized_pnl
+        self.unrealized_pnl[i] = account_info.unrealized_pnl
+        self.n = i + 1
+
+    def extend(self, timestamp: np.ndarray, columns: Dict[str, np.ndarray]):
+        """整段追加记录（向量化回测用），columns 需包含 FIELDS 中的全部列"""
+        i = self.n
+        n = i + len(timestamp)
+        self.reserve(n)
+        self.timestamp[i:n] = timestamp
+        for name in self.FIELDS:
+            getattr(self, name)[i:n] = columns[name]
+        self.n = n
+        self.refresh_drawdown()
+
+    def to_frame(self) -> pd.DataFrame:
+        """按列直接构造 DataFrame"""
+        n = self.n
+        columns = {'timestamp': self.timestamp[:n]}
+        for name in self.FIELDS:
+            columns[name] = getattr(self, name)[:n]
+        return pd.DataFrame(columns)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, index: int) -> Dict:
+        if index < 0:
+            index += self.n
+        if not 0 <= index < self.n:
+            raise IndexError(index)
+        row = {'timestamp': pd.Timestamp(self.timestamp[index])}
+        for name in self.FIELDS:
+            row[name] = float(getattr(self, name)[index])
+        return row
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(self.n):
+            yield self[i]
 
 
 class Account:
@@ -61,24 +366,42 @@ class Account:
     def __init__(self, initial_capital: float = 100000.0):
         self.initial_capital = initial_capital
         self.cash = initial_capital
-        self.positions: Dict[str, List[Position]] = {}
+        self.positions: Dict[str, PositionBook] = {}
+        # 对外暴露的只读视图，随 positions 实时变化，无需每次复制
+        self._positions_view = MappingProxyType(self.positions)
         self.realized_pnl = 0.0
         self.commission_total = 0.0
         self.trade_count = 0
+        # 持仓变动过的品种；其余品种在价格不变时直接复用上次估值
+        self._dirty: Set[str] = set()
+        self._valuations: Dict[str, Tuple[float, float, float]] = {}
+
+    def mark_dirty(self, symbol: str):
+        """标记品种持仓已变动，下次估值时重新计算"""
+        self._dirty.add(symbol)
 
-    def get_info(self, current_prices: Dict[str, float]) -> AccountInfo:
-        """获取账户信息（只读）"""
+    def get_info(self, current_prices: Dict[str, float], timestamp: Optional[datetime] = None) -> AccountInfo:
+        """获取账户信息（只读），timestamp 由调用方传入当前 bar 时间"""
         market_value = 0.0
         unrealized_pnl = 0.0
 
-        # 更新所有持仓
-        for symbol, lots in self.positions.items():
-            if symbol in current_prices:
-                price = current_prices[symbol]
-                for lot in lots:
-                    lot.update(price)
-                    market_value += lot.market_value
-                    unrealized_pnl += lot.unrealized_pnl
+        dirty = self._dirty
+        valuations = self._valuations
+
+        # 按品种整列估值，仅重算持仓或价格发生变化的品种
+        for symbol, book in self.positions.items():
+            price = current_prices.get(symbol)  # 单次哈希查找
+            if price is not None:
+                cached = valuations.get(symbol)
+                if cached is None or cached[0] != price or symbol in dirty:
+                    book_value, book_pnl = book.update(price)
+                    valuations[symbol] = (price, book_value, book_pnl)
+                    # 只有真正重新估值的品种才清除标记；本 bar 无价格的品种保留到下次有价格时
+                    dirty.discard(symbol)
+                else:
+                    _, book_value, book_pnl = cached
+                market_value += book_value
+                unrealized_pnl += book_pnl
 
         # 期货总资产计算
         # total_assets = 现金 + 未实现盈亏
@@ -92,7 +415,23 @@ class Account:
             total_pnl=total_pnl,
             unrealized_pnl=unrealized_pnl,  # 浮动盈亏
             realized_pnl=self.realized_pnl,
-            positions=self.positions  # 直接引用，避免复制
+            positions=self._positions_view,  # 只读视图，避免复制
+            timestamp=timestamp
         )
 
+    def drop_if_flat(self, symbol: str):
+        """品种全部批次平掉后移除持仓簿及其估值缓存，保证 positions 中只有非零持仓"""
+        book = self.positions.get(symbol)
+        if book is not None and not book:
+            del self.positions[symbol]
+            self._valuations.pop(symbol, None)
+            self._dirty.discard(symbol)
+
+    def get_book(self, symbol: str) -> PositionBook:
+        """获取品种持仓簿，不存在时创建"""
+        book = self.positions.get(symbol)
+        if book is None:
+            book = self.positions[symbol] = PositionBook(symbol)
+        return book
+
     # 账户不再维护 available/locked 资金，锁定保证金由订单和持仓承担
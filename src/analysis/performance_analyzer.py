@@ -4,32 +4,57 @@
 """
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple, Optional
-from datetime import datetime
+from operator import attrgetter
+from typing import Callable, Dict, List, Tuple, Optional
+
+from account.account import AccountHistory
+
+
+def _zero_pnl(trade) -> float:
+    """成交对象没有盈亏字段时的取值函数"""
+    return 0.0
 
 
 class PerformanceAnalyzer:
     """性能分析器"""
     
-    def __init__(self, initial_capital: float, account_history: List[Dict], trades: List):
+    def __init__(self, initial_capital: float, account_history, trades: List):
         """
         初始化分析器
         
         Args:
             initial_capital: 初始资金
-            account_history: 账户历史列表 [{'timestamp': datetime, 'total_assets': float, ...}, ...]
+            account_history: 账户历史，AccountHistory 或旧的 [{'timestamp': datetime, 'total_assets': float, ...}, ...]
             trades: 成交记录列表
         """
         self.initial_capital = initial_capital
+        if not isinstance(account_history, AccountHistory):
+            # 旧格式只在这里转换一次，之后所有指标都按列计算
+            account_history = AccountHistory.from_records(account_history)
+            equity = account_history.total_assets
+            equity[np.isnan(equity)] = initial_capital
+            account_history.refresh_drawdown()
         self.account_history = account_history
         self.trades = trades
         self.performance_metrics = {}
+        self._pnls: Optional[np.ndarray] = None
+        self._pnls_key = None
+        self._pnl_getter: Optional[Callable] = None
+        self._equity: Optional[np.ndarray] = None
+        self._returns: Optional[np.ndarray] = None
+        self._running_max: Optional[np.ndarray] = None
+        self._stats: Optional[Tuple[float, float]] = None
+        self._history_len = -1
     
     def calculate_all_metrics(self) -> Dict:
         """计算所有性能指标"""
+        # 先算被其他指标依赖的量，Calmar 直接复用
+        total_return = self.calculate_total_return()
+        max_drawdown = self.calculate_max_drawdown()
+        
         self.performance_metrics = {
-            'total_return': self.calculate_total_return(),
-            'max_drawdown': self.calculate_max_drawdown(),
+            'total_return': total_return,
+            'max_drawdown': max_drawdown,
             'sharpe_ratio': self.calculate_sharpe_ratio(),
             'win_rate': self.calculate_win_rate(),
             'return_volatility': self.calculate_return_volatility(),
@@ -37,7 +62,7 @@ class PerformanceAnalyzer:
             'profitable_trades': self.count_profitable_trades(),
             'avg_profit_per_trade': self.calculate_avg_profit_per_trade(),
             'profit_factor': self.calculate_profit_factor(),
-            'calmar_ratio': self.calculate_calmar_ratio(),
+            'calmar_ratio': self._calmar(total_return, max_drawdown),
         }
         return self.performance_metrics
     
@@ -46,18 +71,18 @@ class PerformanceAnalyzer:
         if not self.account_history:
             return pd.DataFrame()
         
-        df = pd.DataFrame(self.account_history)
-        if 'timestamp' in df.columns:
-            df.set_index('timestamp', inplace=True)
-        
-        return df[['total_assets']] if 'total_assets' in df.columns else df
+        n = len(self.account_history)
+        return pd.DataFrame(
+            {'total_assets': self.account_history.total_assets[:n]},
+            index=pd.DatetimeIndex(self.account_history.timestamp[:n], name='timestamp')
+        )
     
     def calculate_total_return(self) -> float:
         """计算总收益率"""
         if not self.account_history:
             return 0.0
         
-        final_assets = self.account_history[-1].get('total_assets', self.initial_capital)
+        final_assets = self._equity_array()[-1]
         return (final_assets - self.initial_capital) / self.initial_capital
     
     def calculate_max_drawdown(self) -> float:
@@ -69,29 +94,48 @@ class PerformanceAnalyzer:
         if not self.account_history:
             return 0.0
         
-        equity_values = [h.get('total_assets', self.initial_capital) for h in self.account_history]
-        
-        if len(equity_values) < 2:
+        if len(self.account_history) < 2:
             return 0.0
         
-        equity_array = np.array(equity_values)
-        running_max = np.maximum.accumulate(equity_array)
-        drawdown = (equity_array - running_max) / running_max
-        max_drawdown = np.min(drawdown)
-        
-        return abs(max_drawdown)
+        # 账户历史写入时已在线维护最大回撤，直接读取
+        return self.account_history.max_drawdown
     
     def calculate_daily_returns(self) -> np.ndarray:
         """计算每日收益率"""
         if not self.account_history or len(self.account_history) < 2:
             return np.array([])
         
-        equity_values = np.array([h.get('total_assets', self.initial_capital) for h in self.account_history])
-        
-        # 计算日收益率
-        daily_returns = np.diff(equity_values) / equity_values[:-1]
+        self._equity_array()
+        if self._returns is None:
+            equity_values = self._equity
+            # 计算日收益率
+            self._returns = np.diff(equity_values) / equity_values[:-1]
         
-        return daily_returns
+        return self._returns
+    
+    def calculate_running_max(self) -> np.ndarray:
+        """净值的历史峰值序列（缓存），可传给回撤图复用"""
+        equity = self._equity_array()
+        if self._running_max is None:
+            self._running_max = np.maximum.accumulate(equity)
+        return self._running_max
+    
+    def _equity_array(self) -> np.ndarray:
+        """
+        净值数组（缓存），即账户历史 total_assets 列的视图；历史长度变化时重新生成
+        """
+        n = len(self.account_history)
+        if self._equity is not None and self._history_len == n:
+            return self._equity
+        
+        equity = self.account_history.total_assets[:n]
+        
+        self._equity = equity
+        self._returns = None
+        self._running_max = None
+        self._stats = None
+        self._history_len = n
+        return equity
     
     def calculate_return_volatility(self) -> float:
         """
@@ -99,12 +143,10 @@ class PerformanceAnalyzer:
         
         假设252个交易日
         """
-        daily_returns = self.calculate_daily_returns()
-        
-        if len(daily_returns) < 2:
+        if len(self.calculate_daily_returns()) < 2:
             return 0.0
         
-        volatility = np.std(daily_returns, ddof=1)
+        _, volatility = self._returns_stats()
         # 年化波动率
         annual_volatility = volatility * np.sqrt(252)
         
@@ -119,13 +161,10 @@ class PerformanceAnalyzer:
         Args:
             risk_free_rate: 无风险利率 (年化，默认3%)
         """
-        daily_returns = self.calculate_daily_returns()
-        
-        if len(daily_returns) < 2:
+        if len(self.calculate_daily_returns()) < 2:
             return 0.0
         
-        mean_return = np.mean(daily_returns)
-        volatility = np.std(daily_returns, ddof=1)
+        mean_return, volatility = self._returns_stats()
         
         if volatility == 0:
             return 0.0
@@ -139,21 +178,36 @@ class PerformanceAnalyzer:
         
         return sharpe_ratio
     
+    def _returns_stats(self) -> Tuple[float, float]:
+        """
+        日收益率的 (均值, 样本标准差)，算一次后缓存，夏普比率与波动率共用
+        
+        标准差按两遍法（先减均值再求平方和）计算，避免均值远大于波动时
+        平方和相减的抵消误差；调用前需保证至少有 2 个收益率
+        """
+        if self._stats is None:
+            r = self.calculate_daily_returns()
+            self._stats = (np.mean(r), np.std(r, ddof=1))
+        return self._stats
+    
     def calculate_calmar_ratio(self) -> float:
         """
         计算Calmar比率
         
         Calmar Ratio = 年化收益率 / 最大回撤
         """
-        total_return = self.calculate_total_return()
-        max_drawdown = self.calculate_max_drawdown()
-        
+        return self._calmar(self.calculate_total_return(), self.calculate_max_drawdown())
+    
+    def _calmar(self, total_return: float, max_drawdown: float) -> float:
+        """由已算好的总收益率和最大回撤计算 Calmar 比率"""
         if max_drawdown == 0 or not self.account_history:
             return 0.0
         
         # 计算年化收益率（假设1年回测）
-        days = (self.account_history[-1].get('timestamp', datetime.now()) - 
-                self.account_history[0].get('timestamp', datetime.now())).days
+        # datetime64 相减后整除一天，等价于 timedelta.days；缺少时间时按 0 天处理
+        timestamps = self.account_history.timestamp
+        span = timestamps[len(self.account_history) - 1] - timestamps[0]
+        days = 0 if np.isnat(span) else int(span // np.timedelta64(1, 'D'))
         
         if days <= 0:
             days = 1
@@ -170,31 +224,18 @@ class PerformanceAnalyzer:
         if not self.trades:
             return 0.0
         
-        profitable_trades = 0
-        
-        for trade in self.trades:
-            pnl = self._calculate_trade_pnl(trade)
-            if pnl > 0:
-                profitable_trades += 1
-        
-        return profitable_trades / len(self.trades)
+        return self.count_profitable_trades() / len(self.trades)
     
     def count_profitable_trades(self) -> int:
         """统计盈利交易数"""
-        profitable_count = 0
-        for trade in self.trades:
-            pnl = self._calculate_trade_pnl(trade)
-            if pnl > 0:
-                profitable_count += 1
-        return profitable_count
+        return int((self._pnl_array() > 0).sum())
     
     def calculate_avg_profit_per_trade(self) -> float:
         """计算每笔交易平均盈利"""
         if not self.trades:
             return 0.0
         
-        total_pnl = sum(self._calculate_trade_pnl(t) for t in self.trades)
-        return total_pnl / len(self.trades)
+        return float(self._pnl_array().sum()) / len(self.trades)
     
     def calculate_profit_factor(self) -> float:
         """
@@ -205,42 +246,47 @@ class PerformanceAnalyzer:
         if not self.trades:
             return 0.0
         
-        total_gains = 0.0
-        total_losses = 0.0
-        
-        for trade in self.trades:
-            pnl = self._calculate_trade_pnl(trade)
-            if pnl > 0:
-                total_gains += pnl
-            else:
-                total_losses += abs(pnl)
+        pnl = self._pnl_array()
+        total_gains = pnl[pnl > 0].sum()
+        total_losses = -pnl[pnl < 0].sum()
         
         if total_losses == 0:
             return 0.0
         
-        return total_gains / total_losses
+        return float(total_gains / total_losses)
     
-    def _calculate_trade_pnl(self, trade) -> float:
+    def _pnl_array(self) -> np.ndarray:
         """
-        计算单笔交易盈亏
+        全部成交的盈亏数组（缓存）
         
-        支持多种trade数据结构
+        取值函数按第一笔成交解析一次，trades 对象或长度变化时重新计算
         """
-        # 检查是否有直接的pnl属性
+        key = (id(self.trades), len(self.trades))
+        if self._pnls is not None and self._pnls_key == key:
+            return self._pnls
+        
+        n = len(self.trades)
+        if n and self._pnl_getter is None:
+            self._pnl_getter = self._resolve_pnl_getter(self.trades[0])
+        
+        if not n or self._pnl_getter is _zero_pnl:
+            # 期货成交未记录 pnl（需要对手方价格等额外信息），按 0 处理
+            pnls = np.zeros(n)
+        else:
+            pnls = np.fromiter(map(self._pnl_getter, self.trades), dtype=np.float64, count=n)
+        
+        self._pnls = pnls
+        self._pnls_key = key
+        return pnls
+    
+    @staticmethod
+    def _resolve_pnl_getter(trade) -> Callable:
+        """按成交对象的类型选定一次盈亏取值方式，避免逐笔 hasattr 探测"""
         if hasattr(trade, 'pnl'):
-            return trade.pnl
-        
-        # 检查是否有profit属性
+            return attrgetter('pnl')
         if hasattr(trade, 'profit'):
-            return trade.profit
-        
-        # 对于期货交易，根据side计算
-        if hasattr(trade, 'side') and hasattr(trade, 'quantity') and hasattr(trade, 'price'):
-            # 这种情况下需要额外信息（对手方价格等），暂时返回0
-            # 实际应该在Trade对象中记录pnl
-            return 0.0
-        
-        return 0.0
+            return attrgetter('profit')
+        return _zero_pnl
     
     def get_metrics_dict(self) -> Dict:
         """获取指标字典"""
@@ -253,8 +299,8 @@ class DrawdownAnalyzer:
     @staticmethod
     def calculate_drawdown_series(equity_values: np.ndarray) -> np.ndarray:
         """计算回撤序列"""
-        running_max = np.maximum.accumulate(equity_values)
-        drawdown = (equity_values - running_max) / running_max
+        drawdown = equity_values / np.maximum.accumulate(equity_values)
+        drawdown -= 1.0
         return drawdown
     
     @staticmethod
@@ -271,23 +317,19 @@ class DrawdownAnalyzer:
         """
         drawdown = DrawdownAnalyzer.calculate_drawdown_series(equity_values)
         
-        periods = []
-        start_idx = None
-        peak_idx = 0
-        
-        for i in range(len(drawdown)):
-            if drawdown[i] < -threshold:
-                if start_idx is None:
-                    start_idx = i
-                    peak_idx = i
-            else:
-                if start_idx is not None:
-                    max_dd = np.min(drawdown[start_idx:i])
-                    periods.append((start_idx, i, abs(max_dd)))
-                    start_idx = None
-        
-        if start_idx is not None:
-            max_dd = np.min(drawdown[start_idx:])
-            periods.append((start_idx, len(drawdown) - 1, abs(max_dd)))
-        
-        return periods
\ No newline at end of file
+        # 用掩码的上升/下降沿一次找出所有超过阈值的区间
+        below = drawdown < -threshold
+        if not below.any():
+            return []
+        
+        edges = np.diff(below.astype(np.int8), prepend=0, append=0)
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        
+        # 相邻两个区间起点之间，非回撤部分都高于阈值，不影响区间最小值
+        max_dds = np.abs(np.minimum.reduceat(drawdown, starts))
+        
+        # 持续到末尾的区间以最后一个索引作为结束
+        ends[ends == len(drawdown)] = len(drawdown) - 1
+        
+        return list(zip(starts.tolist(), ends.tolist(), max_dds.tolist()))
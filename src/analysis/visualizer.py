@@ -2,35 +2,220 @@
 """
 可视化模块 - 生成回测结果图表
 """
-import matplotlib.pyplot as plt
+import matplotlib
 import matplotlib.dates as mdates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import numpy as np
-import pandas as pd
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from account.account import AccountHistory
+
+
+def _extract_equity(account_history) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    直接取出 (时间, 总资产) 两列，不经过 DataFrame
+    
+    缺少 timestamp 时用序号代替；缺少 total_assets 时总资产返回 None
+    """
+    n = len(account_history)
+    if isinstance(account_history, AccountHistory):
+        return account_history.timestamp[:n], account_history.total_assets[:n]
+    
+    # 旧的 List[Dict] 只取需要的两列，不构造其余字段
+    first = account_history[0]
+    if 'timestamp' in first:
+        timestamps = np.array([h.get('timestamp') for h in account_history], dtype='datetime64[ns]')
+    else:
+        timestamps = np.arange(n)
+    if 'total_assets' in first:
+        equity = np.fromiter((h.get('total_assets', np.nan) for h in account_history),
+                             dtype=np.float64, count=n)
+    else:
+        equity = None
+    
+    return timestamps, equity
+
+
+# 超过该点数的序列在绘图前抽稀到约 _PLOT_TARGET_POINTS 个点（折线用 LTTB，回撤按桶取最小值），
+# 并以栅格化方式绘制
+_PLOT_DECIMATE_THRESHOLD = 5000
+_PLOT_TARGET_POINTS = 4000
+
+# 固定边距代替 tight_layout 的迭代求解；保存时 bbox_inches='tight' 会再按实际内容裁剪
+_SUBPLOT_MARGINS = dict(left=0.08, right=0.97, top=0.92, bottom=0.15)
+
+# 账户历史短于该长度时串行绘图
+_PARALLEL_MIN_POINTS = 5000
+
+
+def _plot_indices(n: int) -> Optional[np.ndarray]:
+    """长序列的等步长分桶起点（保留末点），短序列返回 None 表示不抽稀"""
+    if n <= _PLOT_DECIMATE_THRESHOLD:
+        return None
+    idx = np.arange(0, n, n // _PLOT_TARGET_POINTS)
+    if idx[-1] != n - 1:
+        idx = np.append(idx, n - 1)
+    return idx
+
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 抽样下标
+    
+    首末点固定保留；中间按桶划分，每桶选出与上一选中点、下一桶均值
+    构成三角形面积最大的点，比等步长抽样更能保留曲线的峰谷形状；
+    点数不超过 n_out 时返回全部下标
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    every = (n - 2) / (n_out - 2)
+    # 第 i 个桶的范围为 [edges[i], edges[i+1])，桶均值与选点无关，可一次算出
+    edges = (np.arange(n_out - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / counts, y[-1])
+    
+    sampled = np.empty(n_out, dtype=np.int64)
+    sampled[0] = 0
+    sampled[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        xa, ya = x[a], y[a]
+        area = np.abs((xa - avg_x[i + 1]) * (y[lo:hi] - ya) - (xa - x[lo:hi]) * (avg_y[i + 1] - ya))
+        a = lo + int(area.argmax())
+        sampled[i + 1] = a
+    return sampled
+
+
+def _downsample(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """长序列按 LTTB 抽稀到约 _PLOT_TARGET_POINTS 个点，短序列原样返回"""
+    if len(y) <= _PLOT_DECIMATE_THRESHOLD:
+        return x, y
+    # 时间轴按纳秒整数参与面积计算
+    xf = x.astype(np.int64).astype(np.float64) if x.dtype.kind == 'M' else x.astype(np.float64)
+    idx = _lttb_indices(xf, y, _PLOT_TARGET_POINTS)
+    return x[idx], y[idx]
+
+
+def _rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    滚动样本标准差，结果与 pd.Series.rolling(window).std() 一致
+    
+    前缀和求滚动方差：窗口和与平方和各做一次差分，O(n) 全向量化；
+    先减去整体均值，减小平方和相减时的抵消误差。
+    NaN 按 0 计入前缀和，含 NaN 的窗口结果为 NaN，NaN 移出窗口后恢复
+    """
+    x = np.asarray(values, dtype=np.float64)
+    result = np.full(len(x), np.nan)
+    if len(x) < window:
+        return result
+    
+    nan = np.isnan(x)
+    x = np.where(nan, 0.0, x - np.nanmean(x)) if nan.any() else x - x.mean()
+    c1 = np.concatenate(([0.0], np.cumsum(x)))
+    c2 = np.concatenate(([0.0], np.cumsum(x * x)))
+    s1 = c1[window:] - c1[:-window]
+    s2 = c2[window:] - c2[:-window]
+    var = (s2 - s1 * s1 / window) / (window - 1)
+    std = np.sqrt(np.maximum(var, 0.0))
+    if nan.any():
+        counts = np.concatenate(([0], np.cumsum(nan)))
+        std[counts[window:] - counts[:-window] > 0] = np.nan
+    result[window - 1:] = std
+    return result
+
+
+def _init_chart_worker(font_names: List[str], unicode_minus: bool):
+    """图表子进程初始化：沿用主进程已选好的字体设置"""
+    matplotlib.rcParams['font.sans-serif'] = font_names
+    matplotlib.rcParams['axes.unicode_minus'] = unicode_minus
+
+
+def _render_chart(visualizer: 'BacktestVisualizer', method: str, args: tuple, kwargs: dict) -> str:
+    """在子进程中执行单个绘图方法，返回图片路径"""
+    return getattr(visualizer, method)(*args, **kwargs)
+
+
+def _format_metric(value, fmt: str) -> str:
+    """按格式串格式化单个指标值，非数值或格式不匹配时退回 str"""
+    if isinstance(value, (int, float)):
+        try:
+            return format(value, fmt)
+        except (TypeError, ValueError):
+            pass
+    return str(value)
 
 
 class BacktestVisualizer:
     """回测结果可视化器"""
     
-    def __init__(self, output_dir: str = "data/results"):
+    # 已选定的字体，所有实例共用
+    _selected_font: Optional[str] = None
+    
+    def __init__(self, output_dir: str = "data/results", dpi: int = 100):
         """
         初始化可视化器
         
         Args:
             output_dir: 输出目录
+            dpi: 图片分辨率，批量生成报告时 100 已足够清晰
         """
         self.output_dir = output_dir
+        self.dpi = dpi
         os.makedirs(output_dir, exist_ok=True)
+        self._fig: Optional[Figure] = None
         
         # 设置中文字体 - 改进版本
         self._setup_font()
 
     
-    def _setup_font(self):
-        """设置中文字体"""
-        import matplotlib
+    def _new_axes(self, figsize: Tuple[float, float]):
+        """
+        取得一个空白坐标轴
+        
+        所有图表复用同一个 Agg Figure，每次只清空内容并调整尺寸，
+        不经过 pyplot，也就没有 GUI 后端探测和重复创建画布的开销
+        """
+        fig = self._fig
+        if fig is None:
+            fig = self._fig = Figure()
+            FigureCanvasAgg(fig)
+        else:
+            fig.clf()
+        fig.set_size_inches(figsize)
+        return fig, fig.add_subplot()
+    
+    def close(self):
+        """释放复用的 Figure"""
+        self._fig = None
+    
+    def __getstate__(self):
+        # 发送到子进程时不携带 Figure
+        state = self.__dict__.copy()
+        state['_fig'] = None
+        return state
+    
+    @classmethod
+    def _setup_font(cls):
+        """设置中文字体（字体扫描每个进程只做一次，结果缓存在类上）"""
+        if cls._selected_font is None:
+            cls._selected_font = cls._find_font()
+        
+        matplotlib.rcParams['font.sans-serif'] = [cls._selected_font, 'DejaVu Sans']
+        matplotlib.rcParams['axes.unicode_minus'] = False
+    
+    @staticmethod
+    def _find_font() -> str:
+        """按平台候选列表查找可用字体"""
+        import matplotlib.font_manager
         import sys
         
         # Windows系统
@@ -43,38 +228,37 @@ class BacktestVisualizer:
         else:
             font_names = ['DejaVu Sans', 'SimHei', 'STHeiti']
         
+        # 已经配置了候选中的中文字体时，无需扫描文件系统
+        configured = matplotlib.rcParams['font.sans-serif']
+        if configured and configured[0] in font_names and configured[0] != 'DejaVu Sans':
+            return configured[0]
+        
         # 尝试找到可用的字体
         available_fonts = matplotlib.font_manager.findSystemFonts()
         available_font_names = [os.path.basename(f) for f in available_fonts]
         
-        selected_font = None
         for font in font_names:
             if any(font.lower() in fname.lower() for fname in available_font_names):
-                selected_font = font
-                break
+                return font
         
         # 如果没有找到中文字体，使用默认
-        if selected_font is None:
-            selected_font = 'DejaVu Sans'
-        
-        plt.rcParams['font.sans-serif'] = [selected_font, 'DejaVu Sans']
-        plt.rcParams['axes.unicode_minus'] = False
+        return 'DejaVu Sans'
     
     def plot_equity_curve(self, account_history: List[Dict], title: str = "净值曲线", 
-                         save_path: Optional[str] = None) -> str:
-        """绘制净值曲线"""
+                         save_path: Optional[str] = None,
+                         equity_data: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> str:
+        """绘制净值曲线（equity_data 为已提取的 (时间, 总资产)，可省去重复提取）"""
         if not account_history:
             return ""
         
-        df = pd.DataFrame(account_history)
+        timestamps, equity = equity_data or _extract_equity(account_history)
         
-        fig, ax = plt.subplots(figsize=(14, 6))
+        fig, ax = self._new_axes((14, 6))
         
-        if 'timestamp' in df.columns:
-            df.set_index('timestamp', inplace=True)
-        
-        if 'total_assets' in df.columns:
-            ax.plot(df.index, df['total_assets'], label='总资产', linewidth=2, color='#1f77b4')
+        if equity is not None:
+            dense = len(equity) > _PLOT_DECIMATE_THRESHOLD
+            timestamps, equity = _downsample(timestamps, equity)
+            ax.plot(timestamps, equity, label='总资产', linewidth=2, color='#1f77b4', rasterized=dense)
         
         ax.set_title(title, fontsize=14, fontweight='bold')
         ax.set_xlabel('日期', fontsize=12)
@@ -84,38 +268,51 @@ class BacktestVisualizer:
         
         # 格式化x轴
         ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-        plt.xticks(rotation=45)
+        ax.tick_params(axis='x', labelrotation=45)
         
-        plt.tight_layout()
+        fig.subplots_adjust(**_SUBPLOT_MARGINS)
         
         save_path = save_path or os.path.join(self.output_dir, 'equity_curve.png')
-        plt.savefig(save_path, dpi=150, bbox_inches='tight')
-        plt.close()
+        fig.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
         
         return save_path
     
-    def plot_drawdown(self, account_history: List[Dict], save_path: Optional[str] = None) -> str:
-        """绘制回撤曲线"""
+    def plot_drawdown(self, account_history: List[Dict], save_path: Optional[str] = None,
+                      equity_data: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                      running_max: Optional[np.ndarray] = None) -> str:
+        """
+        绘制回撤曲线
+        
+        equity_data 为已提取的 (时间, 总资产)，running_max 为分析器已算好的峰值序列，
+        传入时可省去重复计算
+        """
         if not account_history:
             return ""
         
-        df = pd.DataFrame(account_history)
-        
-        if 'timestamp' in df.columns:
-            df.set_index('timestamp', inplace=True)
+        timestamps, equity = equity_data or _extract_equity(account_history)
         
-        if 'total_assets' not in df.columns:
+        if equity is None:
             return ""
         
-        equity = df['total_assets'].values
-        running_max = np.maximum.accumulate(equity)
+        if running_max is None or len(running_max) != len(equity):
+            running_max = np.maximum.accumulate(equity)
+        
         # 回撤是负数，表示从峰值下降的百分比
-        drawdown = (equity - running_max) / running_max * 100
+        drawdown = equity / running_max
+        drawdown -= 1.0
+        drawdown *= 100
         
-        fig, ax = plt.subplots(figsize=(14, 6))
+        fig, ax = self._new_axes((14, 6))
         
-        # 绘制回撤柱状图 - 回撤总是负数或零，所以统一用红色
-        ax.bar(df.index, drawdown, color='#d62728', alpha=0.7, label='回撤 (%)')
+        # 长序列按桶取最小值抽稀，保留每段的回撤深度
+        idx = _plot_indices(len(drawdown))
+        if idx is not None:
+            timestamps, drawdown = timestamps[idx], np.minimum.reduceat(drawdown, idx)
+        
+        # 回撤总是负数或零：用掩码一次填充，代替逐点创建柱子
+        # 栅格化：保存为矢量格式时也只输出一层位图
+        ax.fill_between(timestamps, drawdown, 0, where=drawdown < 0, color='#d62728',
+                        alpha=0.7, interpolate=True, label='回撤 (%)', rasterized=True)
         
         ax.set_title('最大回撤', fontsize=14, fontweight='bold')
         ax.set_xlabel('日期', fontsize=12)
@@ -126,13 +323,12 @@ class BacktestVisualizer:
         
         # 格式化x轴
         ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-        plt.xticks(rotation=45)
+        ax.tick_params(axis='x', labelrotation=45)
         
-        plt.tight_layout()
+        fig.subplots_adjust(**_SUBPLOT_MARGINS)
         
         save_path = save_path or os.path.join(self.output_dir, 'drawdown.png')
-        plt.savefig(save_path, dpi=150, bbox_inches='tight')
-        plt.close()
+        fig.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
         
         return save_path
   
@@ -141,7 +337,7 @@ class BacktestVisualizer:
         if daily_returns is None or len(daily_returns) == 0:
             return ""
         
-        fig, ax = plt.subplots(figsize=(10, 6))
+        fig, ax = self._new_axes((10, 6))
         
         ax.hist(daily_returns * 100, bins=50, color='#1f77b4', alpha=0.7, edgecolor='black')
         
@@ -151,11 +347,10 @@ class BacktestVisualizer:
         ax.axvline(x=0, color='red', linestyle='--', linewidth=1.5)
         ax.grid(True, alpha=0.3, axis='y')
         
-        plt.tight_layout()
+        fig.subplots_adjust(**_SUBPLOT_MARGINS)
         
         save_path = save_path or os.path.join(self.output_dir, 'returns_distribution.png')
-        plt.savefig(save_path, dpi=150, bbox_inches='tight')
-        plt.close()
+        fig.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
         
         return save_path
     
@@ -164,11 +359,19 @@ class BacktestVisualizer:
         if daily_returns is None or len(daily_returns) == 0:
             return ""
         
-        cumulative_returns = np.cumprod(1 + daily_returns) - 1
+        if (daily_returns > -1).all():
+            # 对数空间累加：log1p/cumsum/expm1 均为向量化运算，长序列也更稳定
+            cumulative_returns = np.expm1(np.cumsum(np.log1p(daily_returns)))
+        else:
+            # 出现亏损超过 100% 的收益率时对数无定义，退回连乘
+            cumulative_returns = np.cumprod(1 + daily_returns) - 1
         
-        fig, ax = plt.subplots(figsize=(14, 6))
+        fig, ax = self._new_axes((14, 6))
         
-        ax.plot(cumulative_returns * 100, linewidth=2, color='#1f77b4', label='累计收益')
+        dense = len(cumulative_returns) > _PLOT_DECIMATE_THRESHOLD
+        x, cumulative_returns = _downsample(np.arange(len(cumulative_returns)), cumulative_returns)
+        ax.plot(x, cumulative_returns * 100, linewidth=2, color='#1f77b4', label='累计收益',
+                rasterized=dense)
         
         ax.set_title('累计收益率', fontsize=14, fontweight='bold')
         ax.set_xlabel('交易日', fontsize=12)
@@ -177,11 +380,10 @@ class BacktestVisualizer:
         ax.legend(fontsize=11)
         ax.grid(True, alpha=0.3)
         
-        plt.tight_layout()
+        fig.subplots_adjust(**_SUBPLOT_MARGINS)
         
         save_path = save_path or os.path.join(self.output_dir, 'cumulative_returns.png')
-        plt.savefig(save_path, dpi=150, bbox_inches='tight')
-        plt.close()
+        fig.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
         
         return save_path
     
@@ -191,11 +393,14 @@ class BacktestVisualizer:
         if daily_returns is None or len(daily_returns) < window:
             return ""
         
-        volatility = pd.Series(daily_returns).rolling(window=window).std() * np.sqrt(252)
+        volatility = _rolling_std(daily_returns, window) * np.sqrt(252)
         
-        fig, ax = plt.subplots(figsize=(14, 6))
+        fig, ax = self._new_axes((14, 6))
         
-        ax.plot(volatility, linewidth=2, color='#ff7f0e', label=f'{window}日滚动波动率')
+        # 前 window-1 个值及含 NaN 的窗口为 NaN，只抽稀有效部分
+        x = np.flatnonzero(~np.isnan(volatility))
+        x, valid = _downsample(x, volatility[x])
+        ax.plot(x, valid, linewidth=2, color='#ff7f0e', label=f'{window}日滚动波动率')
         
         ax.set_title(f'滚动波动率 (年化)', fontsize=14, fontweight='bold')
         ax.set_xlabel('交易日', fontsize=12)
@@ -203,24 +408,20 @@ class BacktestVisualizer:
         ax.legend(fontsize=11)
         ax.grid(True, alpha=0.3)
         
-        plt.tight_layout()
+        fig.subplots_adjust(**_SUBPLOT_MARGINS)
         
         save_path = save_path or os.path.join(self.output_dir, 'volatility.png')
-        plt.savefig(save_path, dpi=150, bbox_inches='tight')
-        plt.close()
+        fig.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
         
         return save_path
     
     def plot_metrics_summary(self, metrics: Dict, save_path: Optional[str] = None) -> str:
         """绘制指标摘要（文本信息）"""
-        import matplotlib.pyplot as plt
-        import matplotlib.font_manager as fm
-        
         # 设置中文字体
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'DejaVu Sans']  # 用来正常显示中文标签
-        plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+        matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'DejaVu Sans']  # 用来正常显示中文标签
+        matplotlib.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
 
-        fig, ax = plt.subplots(figsize=(10, 8))
+        fig, ax = self._new_axes((10, 8))
         ax.axis('off')
         
         # 格式化指标
@@ -242,22 +443,12 @@ class BacktestVisualizer:
             ('avg_profit_per_trade', 'Avg Profit/Trade', ',.2f'),
         ]
         
-        for key, label, fmt in metric_labels:
-            if key in metrics:
-                value = metrics[key]
-                try:
-                    if isinstance(value, float) and fmt.startswith('.'):
-                        formatted_value = format(value, fmt)
-                    elif isinstance(value, (int, float)):
-                        formatted_value = format(value, fmt)
-                    else:
-                        formatted_value = str(value)
-                except:
-                    formatted_value = str(value)
-                
-                # 使用固定宽度格式化
-                line = f"{label}".ljust(20) + f"{formatted_value:>15}"
-                summary_lines.append(line)
+        # 使用固定宽度格式化，一次 join 拼出全部文本
+        summary_lines.extend(
+            label.ljust(20) + f"{_format_metric(metrics[key], fmt):>15}"
+            for key, label, fmt in metric_labels
+            if key in metrics
+        )
         
         summary_text = "\n".join(summary_lines)
 
@@ -270,11 +461,10 @@ class BacktestVisualizer:
                 bbox=dict(boxstyle='round', facecolor='#f0f0f0', alpha=0.8, pad=1),
                 wrap=False)
         
-        plt.tight_layout()
+        fig.subplots_adjust(**_SUBPLOT_MARGINS)
         
         save_path = save_path or os.path.join(self.output_dir, 'metrics_summary.png')
-        plt.savefig(save_path, dpi=150, bbox_inches='tight')
-        plt.close()
+        fig.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
         
         return save_path
     
@@ -287,7 +477,7 @@ class BacktestVisualizer:
             '胜率': metrics.get('win_rate', 0) * 100,
         }
         
-        fig, ax = plt.subplots(figsize=(10, 6))
+        fig, ax = self._new_axes((10, 6))
         
         colors = ['#2ca02c' if v > 0 else '#d62728' for v in key_metrics.values()]
         bars = ax.bar(key_metrics.keys(), key_metrics.values(), color=colors, alpha=0.7, edgecolor='black')
@@ -304,48 +494,71 @@ class BacktestVisualizer:
         ax.axhline(y=0, color='black', linestyle='-', linewidth=0.8)
         ax.grid(True, alpha=0.3, axis='y')
         
-        plt.tight_layout()
+        fig.subplots_adjust(**_SUBPLOT_MARGINS)
         
         save_path = save_path or os.path.join(self.output_dir, 'metrics_bars.png')
-        plt.savefig(save_path, dpi=150, bbox_inches='tight')
-        plt.close()
+        fig.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
         
         return save_path
     
     def generate_all_charts(self, account_history: List[Dict], daily_returns: np.ndarray,
-                           metrics: Dict, timestamp: str = "") -> Dict[str, str]:
-        """生成所有图表"""
+                           metrics: Dict, timestamp: str = "",
+                           running_max: Optional[np.ndarray] = None) -> Dict[str, str]:
+        """生成所有图表（running_max 为分析器的峰值序列，供回撤图复用）"""
         prefix = f"_{timestamp}" if timestamp else ""
         
+        # 净值曲线与回撤图共用一次提取结果
+        equity_data = _extract_equity(account_history) if account_history else None
+        
+        jobs = {
+            'equity_curve': ('plot_equity_curve', (account_history,), {
+                'save_path': os.path.join(self.output_dir, f'equity_curve{prefix}.png'),
+                'equity_data': equity_data,
+            }),
+            'drawdown': ('plot_drawdown', (account_history,), {
+                'save_path': os.path.join(self.output_dir, f'drawdown{prefix}.png'),
+                'equity_data': equity_data,
+                'running_max': running_max,
+            }),
+            'returns_distribution': ('plot_returns_distribution', (daily_returns,), {
+                'save_path': os.path.join(self.output_dir, f'returns_distribution{prefix}.png'),
+            }),
+            'cumulative_returns': ('plot_cumulative_returns', (daily_returns,), {
+                'save_path': os.path.join(self.output_dir, f'cumulative_returns{prefix}.png'),
+            }),
+            'volatility': ('plot_volatility', (daily_returns,), {
+                'save_path': os.path.join(self.output_dir, f'volatility{prefix}.png'),
+            }),
+            'metrics_summary': ('plot_metrics_summary', (metrics,), {
+                'save_path': os.path.join(self.output_dir, f'metrics_summary{prefix}.png'),
+            }),
+            'metrics_bars': ('plot_metrics_bars', (metrics,), {
+                'save_path': os.path.join(self.output_dir, f'metrics_bars{prefix}.png'),
+            }),
+        }
+        
+        # 各图表互不依赖，多核且历史足够长时分发到进程池并行渲染；
+        # 短历史每张图只需几十毫秒，启动进程池反而更慢
+        workers = min(len(jobs), os.cpu_count() or 1)
+        if workers > 1 and len(account_history) >= _PARALLEL_MIN_POINTS:
+            font_rc = (list(matplotlib.rcParams['font.sans-serif']), matplotlib.rcParams['axes.unicode_minus'])
+            try:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_chart_worker,
+                                         initargs=font_rc) as executor:
+                    futures = {
+                        name: executor.submit(_render_chart, self, method, args, kwargs)
+                        for name, (method, args, kwargs) in jobs.items()
+                    }
+                    return {name: future.result() for name, future in futures.items()}
+            except (OSError, BrokenProcessPool):
+                # 无法创建子进程时退回串行
+                pass
+        
         charts = {
-            'equity_curve': self.plot_equity_curve(
-                account_history, 
-                save_path=os.path.join(self.output_dir, f'equity_curve{prefix}.png')
-            ),
-            'drawdown': self.plot_drawdown(
-                account_history,
-                save_path=os.path.join(self.output_dir, f'drawdown{prefix}.png')
-            ),
-            'returns_distribution': self.plot_returns_distribution(
-                daily_returns,
-                save_path=os.path.join(self.output_dir, f'returns_distribution{prefix}.png')
-            ),
-            'cumulative_returns': self.plot_cumulative_returns(
-                daily_returns,
-                save_path=os.path.join(self.output_dir, f'cumulative_returns{prefix}.png')
-            ),
-            'volatility': self.plot_volatility(
-                daily_returns,
-                save_path=os.path.join(self.output_dir, f'volatility{prefix}.png')
-            ),
-            'metrics_summary': self.plot_metrics_summary(
-                metrics,
-                save_path=os.path.join(self.output_dir, f'metrics_summary{prefix}.png')
-            ),
-            'metrics_bars': self.plot_metrics_bars(
-                metrics,
-                save_path=os.path.join(self.output_dir, f'metrics_bars{prefix}.png')
-            ),
+            name: getattr(self, method)(*args, **kwargs)
+            for name, (method, args, kwargs) in jobs.items()
         }
+        # 全部图表共用的 Figure 在最后统一释放
+        self.close()
         
         return charts
\ No newline at end of file
@@ -25,8 +25,8 @@ class BaseBroker(ABC):
         pass
     
     @abstractmethod
-    def get_account_info(self) -> AccountInfo:
-        """获取账户信息"""
+    def get_account_info(self, timestamp: Optional[datetime] = None) -> AccountInfo:
+        """获取账户信息，timestamp 为空时使用最新行情时间"""
         pass
     
     @abstractmethod
@@ -34,6 +34,10 @@ class BaseBroker(ABC):
         """获取持仓"""
         pass
     
+    def get_position(self, symbol: str) -> float:
+        """获取单个品种的净持仓，子类可覆盖以免构造整张持仓表"""
+        return self.get_positions().get(symbol, 0.0)
+    
     @abstractmethod
     def get_open_orders(self) -> List[Order]:
         """获取活跃订单"""
@@ -1,17 +1,37 @@
 # engine.py
-from typing import Dict, Optional
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import reduce
+from typing import Dict, List, Optional
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from core.virtual_broker import VirtualBroker
-from models.order import OrderSide
+from account.account import AccountHistory, AccountInfo, PositionBook
+from models.order import OrderSide, Trade
 from strategy.strategy import BaseStrategy
 from .event import Event, EventType
 
 
+_OHLC_COLUMNS = ('open', 'high', 'low', 'close')
+_OHLCV_COLUMNS = _OHLC_COLUMNS + ('volume',)
+
+
 class BacktestEngine:
     """回测引擎"""
     
-    def __init__(self, initial_capital: float = 100000.0, broker=None):
+    def __init__(self, initial_capital: float = 100000.0, broker=None, account_update_interval: int = 1):
+        """
+        Args:
+            initial_capital: 初始资金
+            broker: 经纪商，默认创建 VirtualBroker
+            account_update_interval: 每隔多少个 bar 向策略推送一次账户事件（账户历史仍逐 bar 记录），
+                最后一个 bar 总会推送
+        """
+        if account_update_interval < 1:
+            raise ValueError("account_update_interval 必须 >= 1")
+        self.account_update_interval = account_update_interval
         if broker is None:
             # 创建默认的VirtualBroker
             from .virtual_broker import VirtualBroker
@@ -23,7 +43,9 @@ class BacktestEngine:
         self.data: Dict[str, pd.DataFrame] = {}
         self.current_time: Optional[datetime] = None
         self.results = {}
-        self.account_history = []  # 记录账户历史
+        self.account_history = AccountHistory()  # 记录账户历史（按列存储）
+        # 逐 bar 复用的账户事件：处理器只应在回调内读取，不要保留事件对象本身
+        self._account_event = Event(EventType.ACCOUNT, None, {'account_info': None})
         
     def add_data(self, symbol: str, data: pd.DataFrame):
         """添加数据"""
@@ -47,57 +69,246 @@ class BacktestEngine:
     
     def run(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
         """运行回测"""
-        # 合并所有数据的时间索引
-        all_times = set()
-        for symbol, df in self.data.items():
-            all_times.update(df.index)
+        times = self._build_timeline(start_date, end_date)
+        
+        # 按整数日序号预先标出换日的 bar，循环内不再逐个构造 date 比较
+        days = times.normalize().asi8
+        new_day = np.empty(len(days), dtype=bool)
+        if len(days):
+            new_day[0] = False
+            np.not_equal(days[1:], days[:-1], out=new_day[1:])
         
-        times = sorted(list(all_times))
+        self.account_history.reserve(len(self.account_history) + len(times))
         
-        # 时间范围过滤
-        if start_date:
-            times = [t for t in times if t >= start_date]
-        if end_date:
-            times = [t for t in times if t <= end_date]
+        # 预先求出每个时间点在各品种数据中的行号（缺失为 -1），循环内不再逐 bar 哈希查找
+        row_positions = {symbol: df.index.get_indexer(times) for symbol, df in self.data.items()}
+        # 撮合所需的 OHLC 预先转成 float 数组，经纪商直接取标量；缺列时退回按 Series 更新
+        ohlc_arrays = {
+            symbol: df[list(_OHLC_COLUMNS)].to_numpy(dtype=float) if set(_OHLC_COLUMNS).issubset(df.columns) else None
+            for symbol, df in self.data.items()
+        }
+        update_fast = getattr(self.broker, 'update_market_data_fast', None)
+
+        interval = self.account_update_interval
+        account_event = self._account_event
+        # 循环前绑定好各策略的 on_bar，循环内不再逐 bar 遍历字典和解析属性
+        on_bar_callbacks = tuple(strategy.on_bar for strategy in self.strategies.values())
+        # 没有账户事件订阅者时整段跳过推送
+        has_handlers = getattr(self.broker, 'has_handlers', None)
+        emit_account = has_handlers is None or has_handlers(EventType.ACCOUNT)
+        last = len(times) - 1
         
         # 回测主循环
         for i, timestamp in enumerate(times):
             self.current_time = timestamp
             
             # 每日重置
-            if i > 0 and timestamp.date() != times[i-1].date():
+            if new_day[i]:
                 self.broker.daily_reset()
             
             # 更新每个symbol的数据
             for symbol, df in self.data.items():
-                if timestamp in df.index:
-                    data = df.loc[timestamp]
+                pos = row_positions[symbol][i]
+                if pos >= 0:
+                    data = df.iloc[pos]
                     # 更新经纪商市场数据
-                    self.broker.update_market_data(symbol, data)
+                    ohlc = ohlc_arrays[symbol]
+                    if ohlc is not None and update_fast is not None:
+                        open_, high, low, close = ohlc[pos]
+                        update_fast(symbol, timestamp, open_, high, low, close, bar=data)
+                    else:
+                        self.broker.update_market_data(symbol, data)
                     
                     # 触发策略
-                    for strategy in self.strategies.values():
-                        strategy.on_bar(symbol, data)
+                    for on_bar in on_bar_callbacks:
+                        on_bar(symbol, data)
             
             # 触发账户更新事件
-            account_info = self.broker.get_account_info()
-            self.account_history.append({
-                'timestamp': timestamp,
-                'total_assets': account_info.total_assets,
-                'cash': account_info.cash,
-                'market_value': account_info.market_value,
-                'realized_pnl': account_info.realized_pnl,
-                'unrealized_pnl': account_info.unrealized_pnl,
-            })
-            self.broker.emit_event(Event(
-                event_type=EventType.ACCOUNT,
-                timestamp=timestamp,
-                data={'account_info': account_info}
-            ))
+            account_info = self.broker.get_account_info(timestamp)
+            self.account_history.record(timestamp, account_info)
+            if emit_account and (interval == 1 or (i + 1) % interval == 0 or i == last):
+                account_event.timestamp = timestamp
+                account_event.data['account_info'] = account_info
+                self.broker.emit_event(account_event)
         
         # 收集结果
         self._collect_results()
     
+    def _build_timeline(self, start_date: Optional[datetime], end_date: Optional[datetime]) -> pd.Index:
+        """合并各品种的时间索引并按起止时间截取"""
+        # 各索引已排序，Index.union 在 C 层线性归并
+        indexes = [df.index for df in self.data.values()]
+        times = reduce(pd.Index.union, indexes) if indexes else pd.DatetimeIndex([])
+        if not times.is_unique:
+            times = times.unique()
+        
+        # 时间范围过滤：在有序索引上二分定位起止下标后切片
+        lo, hi = times.slice_locs(start_date or None, end_date or None)
+        return times[lo:hi]
+    
+    def run_vectorized(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+        """
+        向量化回测，适用于信号只依赖行情、与账户状态无关的策略
+        
+        各策略的 generate_signals(ohlcv) 接收按合并时间轴对齐的 (T, S, 5) 数组
+        （open/high/low/close/volume，缺失的 bar 为 NaN，S 的顺序与 add_data 一致），
+        返回 (T, S) 目标持仓手数（正多负空，NaN 表示维持上一目标），多个策略的目标相加。
+        第 t 根 bar 的目标在该品种下一根 bar 的收盘价成交，与逐 bar 模式下市价单的撮合时点一致。
+        
+        成交按批次先开先平结算，成交、现金、盈亏和期末持仓批次与 run() 一致。
+        与 run() 的差异：不做资金/保证金检查，不派发订单/成交/账户事件，不改动经纪商状态。
+        向量化路径不实现执行规则（如 T+1）：经纪商注册了任何规则、任一策略 path_dependent
+        为真或未实现 generate_signals 时都退回 run()。
+        """
+        strategies = list(self.strategies.values())
+        if not strategies or getattr(self.broker, 'rules', None) or any(
+            getattr(strategy, 'path_dependent', True) or not hasattr(strategy, 'generate_signals')
+            for strategy in strategies
+        ):
+            return self.run(start_date, end_date)
+        
+        times = self._build_timeline(start_date, end_date)
+        symbols = list(self.data)
+        n_times, n_symbols = len(times), len(symbols)
+        
+        # 按合并时间轴对齐成 (T, S, 5) 数组
+        ohlcv = np.full((n_times, n_symbols, len(_OHLCV_COLUMNS)), np.nan)
+        present = np.zeros((n_times, n_symbols), dtype=bool)
+        for s, df in enumerate(self.data.values()):
+            rows = df.index.get_indexer(times)
+            mask = rows >= 0
+            present[:, s] = mask
+            for c, column in enumerate(_OHLCV_COLUMNS):
+                if column in df.columns:
+                    ohlcv[mask, s, c] = df[column].to_numpy(dtype=float)[rows[mask]]
+        
+        targets = np.zeros((n_times, n_symbols))
+        for strategy in strategies:
+            signals = np.asarray(strategy.generate_signals(ohlcv), dtype=float)
+            if signals.shape != targets.shape:
+                raise ValueError(f"generate_signals 应返回形状为 {targets.shape} 的目标持仓，实际为 {signals.shape}")
+            targets += signals
+        
+        columns, trades, books = self._simulate_targets(times, symbols, ohlcv[:, :, 3], present, targets)
+        
+        self.account_history.extend(times.to_numpy(dtype='datetime64[ns]'), columns)
+        final = {name: float(values[-1]) if n_times else 0.0 for name, values in columns.items()}
+        if not n_times:
+            final['total_assets'] = final['cash'] = self.broker.account.initial_capital
+        self.results = {
+            'final_account': AccountInfo(
+                total_assets=final['total_assets'],
+                cash=final['cash'],
+                market_value=final['market_value'],
+                total_pnl=final['realized_pnl'] + final['unrealized_pnl'],
+                unrealized_pnl=final['unrealized_pnl'],
+                realized_pnl=final['realized_pnl'],
+                positions=books,
+                timestamp=times[-1] if n_times else None
+            ),
+            'trades': trades,
+            'orders': [],
+            'account_history': self.account_history,
+        }
+    
+    def _simulate_targets(self, times: pd.Index, symbols: List[str], close: np.ndarray,
+                          present: np.ndarray, targets: np.ndarray):
+        """
+        由目标持仓推出成交、手续费和逐 bar 账户列
+        
+        逐 bar 的量全部按列计算；只有成交点（稀疏）逐笔记入持仓簿，
+        与经纪商相同地先平反向批次（先开先平）、再以剩余数量开新批次
+        """
+        config = self.broker.futures_config
+        initial_capital = self.broker.account.initial_capital
+        n_times = len(times)
+        
+        commission_t = np.zeros(n_times)
+        pnl_t = np.zeros(n_times)
+        realized_t = np.zeros(n_times)
+        market_value = np.zeros(n_times)
+        events = []
+        books: Dict[str, PositionBook] = {}
+        
+        for s, symbol in enumerate(symbols):
+            rows = np.flatnonzero(present[:, s])
+            if not len(rows):
+                continue
+            spec = config.get_contract_spec(symbol) if config else None
+            unit = spec.trading_unit if spec is not None else 1
+            
+            # 目标只在该品种有 bar 时读取，NaN 沿用上一目标
+            desired = targets[rows, s]
+            valid = ~np.isnan(desired)
+            last_valid = np.maximum.accumulate(np.where(valid, np.arange(len(rows)), -1))
+            desired = np.where(last_valid >= 0, desired[np.maximum(last_valid, 0)], 0.0)
+            
+            # 每根 bar 收盘成交上一根 bar 的目标
+            position = np.empty(len(rows))
+            position[0] = 0.0
+            position[1:] = desired[:-1]
+            quantity = np.diff(position, prepend=0.0)
+            price = close[rows, s]
+            
+            trade_value = np.abs(quantity) * unit * price
+            
+            # 持仓在两根 bar 之间不变，盯市盈亏只在有 bar 时变化
+            pnl_t[rows[1:]] += position[:-1] * np.diff(price) * unit
+            
+            symbol_value = np.abs(position) * unit * price
+            last_row = np.maximum.accumulate(np.where(present[:, s], np.arange(n_times), -1))
+            market_value += np.where(last_row >= 0, symbol_value[np.searchsorted(rows, np.maximum(last_row, 0))], 0.0)
+            
+            # 成交点逐笔记入持仓簿：手续费与保证金公式、平仓顺序都与经纪商撮合一致
+            book = PositionBook(symbol)
+            for k in np.flatnonzero(quantity):
+                q, p = quantity[k], price[k]
+                commission = spec.commission(trade_value[k]) if spec is not None else 0.0
+                held = book.net_quantity()
+                close_qty = min(abs(q), abs(held)) if held and (held > 0) != (q > 0) else 0.0
+                open_qty = abs(q) - close_qty
+                if close_qty > 0:
+                    realized, _ = book.close(1.0 if held > 0 else -1.0, close_qty, p, unit)
+                    realized_t[rows[k]] += realized
+                if open_qty > 0:
+                    margin = spec.margin(p, open_qty) if spec is not None else open_qty * p
+                    book.append(open_qty if q > 0 else -open_qty, p, unit, margin)
+                commission_t[rows[k]] += commission
+                events.append((rows[k], s, symbol, q, p, commission, trade_value[k]))
+            
+            if book:
+                book.update(price[-1])
+                books[symbol] = book
+        
+        events.sort(key=lambda event: (event[0], event[1]))
+        trades = [
+            Trade(
+                trade_id=str(i + 1),
+                order_id='',
+                symbol=symbol,
+                side=OrderSide.BUY if q > 0 else OrderSide.SELL,
+                quantity=abs(q),
+                price=p,
+                commission=commission,
+                timestamp=times[row],
+                contract_value=trade_value
+            )
+            for i, (row, _, symbol, q, p, commission, trade_value) in enumerate(events)
+        ]
+        
+        cum_commission = np.cumsum(commission_t)
+        cum_realized = np.cumsum(realized_t)
+        total_assets = initial_capital - cum_commission + np.cumsum(pnl_t)
+        cash = initial_capital - cum_commission + cum_realized
+        columns = {
+            'total_assets': total_assets,
+            'cash': cash,
+            'market_value': market_value,
+            'realized_pnl': cum_realized,
+            'unrealized_pnl': total_assets - cash,
+        }
+        return columns, trades, books
+    
     def _collect_results(self):
         """收集回测结果"""
         self.results = {
@@ -111,6 +322,28 @@ class BacktestEngine:
         """获取回测结果"""
         return self.results
     
+    @classmethod
+    def run_parallel(cls, configs: List[Dict], workers: Optional[int] = None) -> List[Dict]:
+        """
+        多进程并行运行相互独立的回测（多品种/参数扫描），返回与 configs 顺序一致的性能指标
+        
+        每个 config 包含:
+            data: {symbol: DataFrame}
+            strategy: 策略类；params: 策略参数（可选）
+            initial_capital、start_date、end_date（可选）
+        单个回测内部仍按时间顺序串行执行；单核或无法创建子进程时退回串行
+        """
+        workers = min(len(configs), workers or os.cpu_count() or 1)
+        if workers > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(_run_backtest_job, cls, config) for config in configs]
+                    return [future.result() for future in futures]
+            except (OSError, BrokenProcessPool):
+                pass
+        
+        return [_run_backtest_job(cls, config) for config in configs]
+    
     def get_performance(self) -> Dict:
         """计算性能指标"""
         from analysis.performance_analyzer import PerformanceAnalyzer
@@ -121,4 +354,14 @@ class BacktestEngine:
             self.results['trades']
         )
         
-        return analyzer.calculate_all_metrics()
\ No newline at end of file
+        return analyzer.calculate_all_metrics()
+
+
+def _run_backtest_job(engine_cls, config: Dict) -> Dict:
+    """在子进程中运行单个回测，返回性能指标"""
+    engine = engine_cls(config.get('initial_capital', 100000.0))
+    for symbol, df in config['data'].items():
+        engine.add_data(symbol, df)
+    engine.add_strategy(config.get('name', 'strategy'), config['strategy'], config.get('params'))
+    engine.run(config.get('start_date'), config.get('end_date'))
+    return engine.get_performance()
@@ -14,13 +14,16 @@ class EventType(Enum):
     ACCOUNT = "account"         # 账户更新事件
     TRADE = "trade"             # 交易事件
 
-@dataclass
+# 手写 __slots__（dataclass(slots=True) 需要 Python 3.10+），默认值写在 __init__ 参数里
+@dataclass(init=False)
 class Event:
     """基础事件类"""
+    __slots__ = ('event_type', 'timestamp', 'data')
     event_type: EventType
     timestamp: datetime
-    data: Optional[Dict[str, Any]] = None
+    data: Optional[Dict[str, Any]]
     
-    def __post_init__(self):
-        if self.data is None:
-            self.data = {}
\ No newline at end of file
+    def __init__(self, event_type: EventType, timestamp: datetime, data: Optional[Dict[str, Any]] = None):
+        self.event_type = event_type
+        self.timestamp = timestamp
+        self.data = {} if data is None else data
@@ -2,14 +2,17 @@
 import logging
 import os
 import sys
-from typing import Dict, List, Callable, Optional
+from typing import TYPE_CHECKING, Dict, List, Callable, Optional
 from datetime import datetime
 import pandas as pd
 from .broker import BaseBroker
 from models.order import Order, OrderType, OrderSide, OrderStatus, Trade
-from account.account import Account, AccountInfo, Position
+from account.account import Account, AccountInfo
 from core.event import Event, EventType
 
+if TYPE_CHECKING:
+    from config.futures_config import ContractSpec
+
 # 添加项目根目录到 Python 路径
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 sys.path.insert(0, project_root)
@@ -33,8 +36,9 @@ class CommissionRule(ExecutionRule):
     
     def calculate_commission(self, trade_value: float) -> float:
         """计算手续费"""
+        # 一次乘法加比较，不经过内建 max 的函数调用
         commission = trade_value * self.commission_rate
-        return max(commission, self.min_commission)
+        return commission if commission > self.min_commission else self.min_commission
 
 
 class TPlusOneRule(ExecutionRule):
@@ -45,7 +49,7 @@ class TPlusOneRule(ExecutionRule):
     def check(self, broker, order: Order, current_price: float) -> bool:
         if order.side == OrderSide.SELL:
             # 检查是否有持仓
-            current_qty = broker.get_positions().get(order.symbol, 0.0)
+            current_qty = broker.get_position(order.symbol)
             if current_qty < order.quantity:
                 # 检查是否是当日买入的
                 if order.symbol in self.today_buy_symbols:
@@ -61,6 +65,18 @@ class TPlusOneRule(ExecutionRule):
         self.today_buy_symbols.clear()
 
 
+def _combine_handlers(handlers: tuple) -> Callable[[Event], None]:
+    """把同一事件的处理器组合为一个分发函数：单个处理器直接调用，多个时按注册顺序依次调用"""
+    if len(handlers) == 1:
+        return handlers[0]
+
+    def dispatch(event: Event):
+        for handler in handlers:
+            handler(event)
+
+    return dispatch
+
+
 class VirtualBroker(BaseBroker):
     """虚拟经纪商"""
     
@@ -71,10 +87,19 @@ class VirtualBroker(BaseBroker):
     ):
         self.account = Account(initial_capital)
         self.orders: Dict[str, Order] = {}
+        # 按品种索引的挂单（按下单顺序），撮合时只遍历本品种；已结束的订单在撮合后惰性清除
+        self._active_by_symbol: Dict[str, List[Order]] = {}
+        # 全部挂单（与 orders 同为下单顺序），锁定保证金只需累加这些订单
+        self._active_orders: Dict[str, Order] = {}
+        # 两个挂单索引覆盖的 orders 条数；不一致说明有订单未经 place_order 直接放入 orders
+        self._indexed_orders = 0
         self.trades: List[Trade] = []
         self.current_prices: Dict[str, float] = {}
+        self.current_time: Optional[datetime] = None  # 最新行情时间
         self.rules: List[ExecutionRule] = []
         self.event_handlers: Dict[EventType, List[Callable]] = {}
+        # 每种事件预先组合好的分发函数，由 register_event_handler 维护
+        self._dispatch: Dict[EventType, Callable[[Event], None]] = {}
 
         self.logger = logging.getLogger(__name__)
 
@@ -82,8 +107,8 @@ class VirtualBroker(BaseBroker):
             config_path = "config/futures_config.yaml"
 
         try:
-            from config.futures_config import FuturesConfig
-            self.futures_config = FuturesConfig(config_path)
+            from config.futures_config import get_futures_config
+            self.futures_config = get_futures_config(config_path)
         except ImportError as e:
             self.logger.error(f"无法导入期货配置模块: {e}")
             self.futures_config = None
@@ -102,26 +127,47 @@ class VirtualBroker(BaseBroker):
         if event_type not in self.event_handlers:
             self.event_handlers[event_type] = []
         self.event_handlers[event_type].append(handler)
+        self._dispatch[event_type] = _combine_handlers(tuple(self.event_handlers[event_type]))
+    
+    def has_handlers(self, event_type: EventType) -> bool:
+        """是否有处理器订阅该事件，供调用方在无人订阅时跳过构造事件"""
+        return event_type in self._dispatch
     
     def emit_event(self, event: Event):
         """触发事件"""
-        handlers = self.event_handlers.get(event.event_type, [])
-        for handler in handlers:
-            handler(event)
+        dispatch = self._dispatch.get(event.event_type)
+        if dispatch is not None:
+            dispatch(event)
     
     def update_market_data(self, symbol: str, data: pd.Series):
         """更新市场数据"""
-        self.current_prices[symbol] = data['close']
+        self.update_market_data_fast(
+            symbol, data.name,  # 假设index是datetime
+            data['open'], data['high'], data['low'], data['close'], bar=data
+        )
+    
+    def update_market_data_fast(self, symbol: str, timestamp: datetime, open_: float, high: float,
+                                low: float, close: float, bar: Optional[pd.Series] = None):
+        """
+        按标量价格更新市场数据，撮合时不再对 Series 逐字段取值
         
-        # 触发市场数据事件
-        self.emit_event(Event(
-            event_type=EventType.MARKET,
-            timestamp=data.name,  # 假设index是datetime
-            data={'symbol': symbol, 'data': data.to_dict()}
-        ))
+        bar 为该 bar 的原始行（Series），原样作为市场事件的载荷；缺省时载荷为只含 OHLC 的字典
+        """
+        self.current_prices[symbol] = close
+        self.current_time = timestamp
+        
+        # 触发市场数据事件：无人订阅时不构造事件；载荷直接传原始行，不再逐 bar to_dict
+        dispatch = self._dispatch.get(EventType.MARKET)
+        if dispatch is not None:
+            payload = bar if bar is not None else {'open': open_, 'high': high, 'low': low, 'close': close}
+            dispatch(Event(
+                event_type=EventType.MARKET,
+                timestamp=timestamp,
+                data={'symbol': symbol, 'data': payload}
+            ))
         
         # 尝试撮合订单
-        self._match_orders(symbol, data)
+        self._match_orders(symbol, timestamp, high, low, close)
     
     def place_order(self, order: Order) -> str:
         """下单（严格资金检查）"""
@@ -208,14 +254,20 @@ class VirtualBroker(BaseBroker):
 
         # 接受订单...
         order.status = OrderStatus.SUBMITTED
+        if len(self.orders) != self._indexed_orders:
+            self._sync_order_index()
         self.orders[order.order_id] = order
+        self._active_by_symbol.setdefault(order.symbol, []).append(order)
+        self._active_orders[order.order_id] = order
+        self._indexed_orders = len(self.orders)
         
         # 触发订单事件
-        self.emit_event(Event(
-            event_type=EventType.ORDER,
-            timestamp=datetime.now(),
-            data={'order': order}
-        ))
+        if EventType.ORDER in self._dispatch:
+            self.emit_event(Event(
+                event_type=EventType.ORDER,
+                timestamp=datetime.now(),
+                data={'order': order}
+            ))
         
         return order.order_id
     
@@ -226,18 +278,30 @@ class VirtualBroker(BaseBroker):
             if order.is_active:
                 order.status = OrderStatus.CANCELLED
                 order.required_margin = 0.0
+                self._active_orders.pop(order_id, None)
+                # 撤单立即移出按品种索引，不必等到下一根 bar 撮合时清理；
+                # 按身份查找（dataclass 的 == 会逐字段比较，且可能匹配到字段相同的另一订单），
+                # 未经 place_order 直接放入 orders 的订单不在索引中
+                active = self._active_by_symbol.get(order.symbol, ())
+                for i, indexed in enumerate(active):
+                    if indexed is order:
+                        del active[i]
+                        break
                 return True
         return False
 
-    def _match_orders(self, symbol: str, data: pd.Series):
+    def _match_orders(self, symbol: str, timestamp: datetime, high_price: float, low_price: float,
+                      current_price: float):
         """撮合订单"""
-        current_price = data['close']
-        open_price = data['open']
-        high_price = data['high']
-        low_price = data['low']
+        if len(self.orders) != self._indexed_orders:
+            self._sync_order_index()
+        active = self._active_by_symbol.get(symbol)
+        if not active:
+            return
         
-        for order in self.orders.values():
-            if not order.is_active or order.symbol != symbol:
+        # 遍历快照：成交回调中新下的订单留到下一根 bar 撮合
+        for order in tuple(active):
+            if not order.is_active:
                 continue
             
             # 简化的撮合逻辑
@@ -255,7 +319,15 @@ class VirtualBroker(BaseBroker):
                 continue
             
             if can_fill:
-                self._fill_order(order, fill_price, data.name)
+                self._fill_order(order, fill_price, timestamp)
+        
+        still_active = []
+        for order in active:
+            if order.is_active:
+                still_active.append(order)
+            else:
+                self._active_orders.pop(order.order_id, None)
+        active[:] = still_active
     
     def _fill_order(self, order: Order, fill_price: float, timestamp: datetime):
         """订单成交"""
@@ -266,13 +338,12 @@ class VirtualBroker(BaseBroker):
 
         # 获取品种配置
         if self.futures_config:
-            config = self.futures_config.get_config(order.symbol)
-            trading_unit = config['trading_unit']
-            margin_rate = config['margin_rate']
-            commission = self.futures_config.calculate_commission(
-                order.symbol, fill_qty * trading_unit * fill_price
-            )
+            spec = self.futures_config.get_contract_spec(order.symbol)
+            trading_unit = spec.trading_unit
+            margin_rate = spec.margin_rate
+            commission = spec.commission(fill_qty * trading_unit * fill_price)
         else:
+            spec = None
             trading_unit = 1
             margin_rate = 1.0
             commission = 0.0
@@ -281,19 +352,17 @@ class VirtualBroker(BaseBroker):
         contract_value = fill_qty * trading_unit * fill_price
 
         # 计算开平仓数量（按成交部分）
-        close_qty = min(getattr(order, "close_quantity", 0.0), fill_qty)
+        close_qty = min(order.close_quantity, fill_qty)
         open_qty = max(fill_qty - close_qty, 0.0)
 
         # 若成交价导致开仓保证金不足，拒绝成交
         if open_qty > 0:
-            if self.futures_config:
-                fill_margin_required = self.futures_config.calculate_margin(
-                    order.symbol, fill_price, open_qty
-                )
+            if spec is not None:
+                fill_margin_required = spec.margin(fill_price, open_qty)
             else:
                 fill_margin_required = open_qty * fill_price
 
-            reserved_margin = getattr(order, "required_margin", 0.0) or 0.0
+            reserved_margin = order.required_margin
             if fill_margin_required > reserved_margin:
                 additional_needed = fill_margin_required - reserved_margin
                 available_cash = self.account.cash - self._get_total_locked_cash(exclude_order_id=order.order_id)
@@ -317,7 +386,9 @@ class VirtualBroker(BaseBroker):
             realized_pnl += self._close_lots(order.symbol, order.side, close_qty, fill_price, trading_unit, margin_rate)
 
         if open_qty > 0:
-            self._open_lot(order.symbol, order.side, open_qty, fill_price, trading_unit, margin_rate)
+            self._open_lot(order.symbol, order.side, open_qty, fill_price, trading_unit, margin_rate, spec)
+
+        self.account.mark_dirty(order.symbol)
 
         # 统一更新现金：只在成交时计入手续费和盈亏
         self.account.cash -= commission
@@ -325,9 +396,7 @@ class VirtualBroker(BaseBroker):
         self.account.realized_pnl += realized_pnl
 
         # 清理空持仓
-        lots = self.account.positions.get(order.symbol, [])
-        if not lots:
-            self.account.positions.pop(order.symbol, None)
+        self.account.drop_if_flat(order.symbol)
 
         self.account.commission_total += commission
         self.account.trade_count += 1
@@ -347,11 +416,12 @@ class VirtualBroker(BaseBroker):
         self.trades.append(trade)
 
         # 触发成交事件
-        self.emit_event(Event(
-            event_type=EventType.FILL,
-            timestamp=timestamp,
-            data={'trade': trade, 'order': order}
-        ))
+        if EventType.FILL in self._dispatch:
+            self.emit_event(Event(
+                event_type=EventType.FILL,
+                timestamp=timestamp,
+                data={'trade': trade, 'order': order}
+            ))
     
     def daily_reset(self):
         """每日重置"""
@@ -364,14 +434,16 @@ class VirtualBroker(BaseBroker):
         order = self.orders.get(order_id)
         return order.status if order else OrderStatus.REJECTED
     
-    def get_account_info(self) -> AccountInfo:
-        return self.account.get_info(self.current_prices)
+    def get_account_info(self, timestamp: Optional[datetime] = None) -> AccountInfo:
+        if timestamp is None:
+            timestamp = self.current_time
+        return self.account.get_info(self.current_prices, timestamp)
 
     def get_positions(self) -> Dict[str, float]:
-        positions: Dict[str, float] = {}
-        for symbol, lots in self.account.positions.items():
-            positions[symbol] = sum(lot.quantity for lot in lots)
-        return positions
+        return {symbol: book.net_quantity() for symbol, book in self.account.positions.items()}
+
+    def get_position(self, symbol: str) -> float:
+        return self._get_net_position(symbol)
 
     def get_open_orders(self) -> List[Order]:
         return [order for order in self.orders.values() if order.is_active]
@@ -386,8 +458,8 @@ class VirtualBroker(BaseBroker):
         return self._get_total_locked_cash()
 
     def _get_net_position(self, symbol: str) -> float:
-        lots = self.account.positions.get(symbol, [])
-        return sum(lot.quantity for lot in lots)
+        book = self.account.positions.get(symbol)
+        return book.net_quantity() if book is not None else 0.0
 
     def _open_lot(
         self,
@@ -397,22 +469,18 @@ class VirtualBroker(BaseBroker):
         price: float,
         trading_unit: int,
         margin_rate: float,
+        spec: Optional['ContractSpec'] = None,
     ) -> None:
         if quantity <= 0:
             return
-        if self.futures_config:
+        if spec is not None:
+            locked_margin = spec.margin(price, quantity)
+        elif self.futures_config:
             locked_margin = self.futures_config.calculate_margin(symbol, price, quantity)
         else:
             locked_margin = quantity * price
         lot_qty = quantity if side == OrderSide.BUY else -quantity
-        lot = Position(
-            symbol=symbol,
-            quantity=lot_qty,
-            entry_price=price,
-            trading_unit=trading_unit,
-            locked_margin=locked_margin,
-        )
-        self.account.positions.setdefault(symbol, []).append(lot)
+        self.account.get_book(symbol).append(lot_qty, price, trading_unit, locked_margin)
 
     def _close_lots(
         self,
@@ -425,61 +493,42 @@ class VirtualBroker(BaseBroker):
     ) -> float:
         if quantity <= 0:
             return 0.0
-        lots = self.account.positions.get(symbol, [])
-        if not lots:
+        book = self.account.positions.get(symbol)
+        if not book:
             return 0.0
 
-        remaining = quantity
-        realized_pnl = 0.0
-
-        def is_closable(lot: Position) -> bool:
-            return (side == OrderSide.BUY and lot.quantity < 0) or (side == OrderSide.SELL and lot.quantity > 0)
-
-        idx = 0
-        while idx < len(lots) and remaining > 0:
-            lot = lots[idx]
-            if not is_closable(lot):
-                idx += 1
-                continue
-
-            lot_qty = abs(lot.quantity)
-            close_qty = min(lot_qty, remaining)
-
-            if lot.quantity > 0:
-                realized_pnl += (price - lot.entry_price) * close_qty * trading_unit
-            else:
-                realized_pnl += (lot.entry_price - price) * close_qty * trading_unit
-
-            if lot_qty > 0:
-                release_ratio = close_qty / lot_qty
-                lot.locked_margin = max(lot.locked_margin * (1 - release_ratio), 0.0)
-
-            new_qty = lot_qty - close_qty
-            remaining -= close_qty
-            if new_qty <= 0:
-                lots.pop(idx)
-                continue
-
-            lot.quantity = new_qty if lot.quantity > 0 else -new_qty
-            idx += 1
+        # 买入平空头批次，卖出平多头批次
+        closable_sign = -1.0 if side == OrderSide.BUY else 1.0
+        realized_pnl, remaining = book.close(closable_sign, quantity, price, trading_unit)
 
         if remaining > 0:
             self.logger.warning("平仓数量不足: symbol=%s, remaining=%s", symbol, remaining)
 
         return realized_pnl
 
+    def _sync_order_index(self):
+        """按 orders 的下单顺序重建挂单索引，收录未经 place_order 直接放入的活跃订单"""
+        self._active_orders = {order_id: order for order_id, order in self.orders.items() if order.is_active}
+        by_symbol: Dict[str, List[Order]] = {}
+        for order in self._active_orders.values():
+            by_symbol.setdefault(order.symbol, []).append(order)
+        self._active_by_symbol = by_symbol
+        self._indexed_orders = len(self.orders)
+
     def _get_total_locked_cash(self, exclude_order_id: Optional[str] = None) -> float:
         """计算当前持仓与挂单占用的保证金"""
+        if len(self.orders) != self._indexed_orders:
+            self._sync_order_index()
         locked_cash = 0.0
-        for lots in self.account.positions.values():
-            for lot in lots:
-                locked_cash += getattr(lot, "locked_margin", 0.0) or 0.0
+        for book in self.account.positions.values():
+            locked_cash += book.total_margin()
 
-        for order in self.orders.values():
+        # 只遍历挂单索引，不再扫描历史上的全部订单；求和顺序与原先一致
+        for order in self._active_orders.values():
             if not order.is_active:
                 continue
             if exclude_order_id and order.order_id == exclude_order_id:
                 continue
-            locked_cash += getattr(order, "required_margin", 0.0) or 0.0
+            locked_cash += order.required_margin
 
         return locked_cash
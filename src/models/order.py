@@ -29,36 +29,79 @@ class OrderStatus(Enum):
     REJECTED = "rejected"   # 已拒绝
 
 
-@dataclass
+# 活跃状态元组只建一次；成员判断按身份比较，不必每次构造列表并查找三个枚举属性
+_ACTIVE_STATUSES = (OrderStatus.PENDING, OrderStatus.SUBMITTED, OrderStatus.PARTIAL_FILLED)
+
+
+# 手写 __slots__：dataclass(slots=True) 需要 Python 3.10+。
+# 槽位与类属性默认值不能共存，有默认值的类关闭生成的 __init__，默认值写在 __init__ 参数里
+@dataclass(init=False)
 class Order:
     """订单类"""
+    __slots__ = (
+        'symbol', 'side', 'order_type', 'quantity', 'price', 'order_id', 'status', 'timestamp',
+        'filled_quantity', 'avg_filled_price', 'commission', 'required_margin',
+        'open_quantity', 'close_quantity', 'reject_reason',
+    )
     symbol: str
     side: OrderSide
     order_type: OrderType
     quantity: float
-    price: Optional[float] = None
-    order_id: Optional[str] = None
-    status: OrderStatus = OrderStatus.PENDING
-    timestamp: Optional[datetime] = None
-    filled_quantity: float = 0.0
-    avg_filled_price: float = 0.0
-    commission: float = 0.0
-    required_margin: float = 0.0
-    open_quantity: float = 0.0
-    close_quantity: float = 0.0
-    reject_reason: Optional[str] = None
+    price: Optional[float]
+    order_id: Optional[str]
+    status: OrderStatus
+    timestamp: Optional[datetime]
+    filled_quantity: float
+    avg_filled_price: float
+    commission: float
+    required_margin: float
+    open_quantity: float
+    close_quantity: float
+    reject_reason: Optional[str]
 
-    def __post_init__(self):
-        if self.order_id is None:
+    def __init__(
+        self,
+        symbol: str,
+        side: OrderSide,
+        order_type: OrderType,
+        quantity: float,
+        price: Optional[float] = None,
+        order_id: Optional[str] = None,
+        status: OrderStatus = OrderStatus.PENDING,
+        timestamp: Optional[datetime] = None,
+        filled_quantity: float = 0.0,
+        avg_filled_price: float = 0.0,
+        commission: float = 0.0,
+        required_margin: float = 0.0,
+        open_quantity: float = 0.0,
+        close_quantity: float = 0.0,
+        reject_reason: Optional[str] = None,
+    ):
+        if order_id is None:
             import uuid
-            self.order_id = str(uuid.uuid4())[:8]
-        if self.timestamp is None:
-            self.timestamp = datetime.now()
+            order_id = str(uuid.uuid4())[:8]
+        if timestamp is None:
+            timestamp = datetime.now()
+        self.symbol = symbol
+        self.side = side
+        self.order_type = order_type
+        self.quantity = quantity
+        self.price = price
+        self.order_id = order_id
+        self.status = status
+        self.timestamp = timestamp
+        self.filled_quantity = filled_quantity
+        self.avg_filled_price = avg_filled_price
+        self.commission = commission
+        self.required_margin = required_margin
+        self.open_quantity = open_quantity
+        self.close_quantity = close_quantity
+        self.reject_reason = reject_reason
     
     @property
     def is_active(self):
         """是否活跃订单"""
-        return self.status in [OrderStatus.PENDING, OrderStatus.SUBMITTED, OrderStatus.PARTIAL_FILLED]
+        return self.status in _ACTIVE_STATUSES
     
     @property
     def remaining_quantity(self):
@@ -69,6 +112,10 @@ class Order:
 @dataclass
 class Trade:
     """成交记录"""
+    __slots__ = (
+        'trade_id', 'order_id', 'symbol', 'side', 'quantity', 'price',
+        'commission', 'timestamp', 'contract_value',
+    )
     trade_id: str
     order_id: str
     symbol: str
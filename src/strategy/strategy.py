@@ -9,6 +9,10 @@ from models.order import Order
 class BaseStrategy(ABC):
     """策略抽象基类"""
     
+    # 信号只依赖行情、与账户状态无关的策略可置为 False 并实现
+    # generate_signals(ohlcv) -> (T, S) 目标持仓，引擎即可用 run_vectorized 整段回测
+    path_dependent = True
+    
     def __init__(self, broker=None, params: Dict[str, Any] = None):
         """
         初始化策略
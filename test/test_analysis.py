@@ -0,0 +1,171 @@
+# test/test_analysis.py
+import sys
+import os
+import warnings
+from datetime import datetime
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+import pandas as pd
+from account.account import AccountHistory, AccountInfo
+from analysis.performance_analyzer import DrawdownAnalyzer, PerformanceAnalyzer
+from analysis.visualizer import _lttb_indices, _rolling_std
+
+
+def test_lttb_indices():
+    """测试 LTTB 抽样保留首末点、下标严格递增，短序列原样返回"""
+    print("=== 测试 LTTB 抽样 ===")
+    rng = np.random.default_rng(0)
+    n = 1000
+    x = np.arange(n, dtype=np.float64)
+    y = np.cumsum(rng.normal(size=n))
+
+    idx = _lttb_indices(x, y, 100)
+    assert len(idx) == 100
+    assert idx[0] == 0 and idx[-1] == n - 1
+    assert (np.diff(idx) > 0).all()
+
+    for n_out in (n, n + 1):
+        assert (_lttb_indices(x, y, n_out) == np.arange(n)).all()
+
+
+def test_rolling_std_matches_pandas():
+    """测试前缀和滚动标准差与 pandas rolling std 一致，NaN 移出窗口后恢复"""
+    print("=== 测试滚动标准差 ===")
+    rng = np.random.default_rng(1)
+    returns = rng.normal(0.0005, 0.01, 500)
+    window = 20
+
+    expected = pd.Series(returns).rolling(window).std().to_numpy()
+    np.testing.assert_allclose(_rolling_std(returns, window), expected, rtol=0, atol=1e-12)
+
+    returns[100] = np.nan
+    result = _rolling_std(returns, window)
+    expected = pd.Series(returns).rolling(window).std().to_numpy()
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-12)
+    assert np.isnan(result[100:100 + window]).all()
+    assert not np.isnan(result[100 + window:]).any()
+
+
+def _drawdown_periods_loop(equity_values, threshold=0.05):
+    """逐点扫描的回撤期间（向量化前的实现），作为对照"""
+    running_max = np.maximum.accumulate(equity_values)
+    drawdown = (equity_values - running_max) / running_max
+    periods = []
+    start_idx = None
+    for i in range(len(drawdown)):
+        if drawdown[i] < -threshold:
+            if start_idx is None:
+                start_idx = i
+        elif start_idx is not None:
+            periods.append((start_idx, i, abs(np.min(drawdown[start_idx:i]))))
+            start_idx = None
+    if start_idx is not None:
+        periods.append((start_idx, len(drawdown) - 1, abs(np.min(drawdown[start_idx:]))))
+    return periods
+
+
+def test_find_drawdown_periods_matches_loop():
+    """测试回撤期间与逐点扫描一致，包括以回撤结束和没有回撤的序列"""
+    print("=== 测试回撤期间 ===")
+    rng = np.random.default_rng(2)
+    equity = 1e6 * np.exp(np.cumsum(rng.normal(0, 0.02, 1000)))
+    # 以深度回撤收尾，最后一个区间持续到末尾
+    equity = np.append(equity, equity.max() * np.linspace(0.97, 0.8, 20))
+
+    periods = DrawdownAnalyzer.find_drawdown_periods(equity)
+    expected = _drawdown_periods_loop(equity)
+    assert len(periods) == len(expected) > 1
+    assert periods[-1][1] == len(equity) - 1
+    for (start, end, max_dd), (exp_start, exp_end, exp_dd) in zip(periods, expected):
+        assert (start, end) == (exp_start, exp_end)
+        assert abs(max_dd - exp_dd) < 1e-12
+
+    rising = np.linspace(1e6, 2e6, 100)
+    assert DrawdownAnalyzer.find_drawdown_periods(rising) == _drawdown_periods_loop(rising) == []
+
+
+def test_account_history_drawdown_online_matches_refresh():
+    """测试逐条 record 在线维护的最大回撤与整列 refresh_drawdown 一致，含净值为 0 或负数的情况"""
+    print("=== 测试账户历史最大回撤 ===")
+    rng = np.random.default_rng(3)
+    samples = [
+        1e6 * np.exp(np.cumsum(rng.normal(0, 0.02, 300))),
+        np.array([100.0, 120.0, 60.0, 0.0, -30.0, 50.0, 130.0, 90.0]),  # 正峰值后跌到 0 和负数
+        np.array([-50.0, -80.0, -20.0, 0.0, 40.0, 10.0]),  # 净值先为负，之后才出现正峰值
+        np.array([-50.0, -80.0, -60.0]),  # 净值从未为正
+    ]
+    for equity in samples:
+        history = AccountHistory()
+        for i, value in enumerate(equity):
+            history.record(pd.Timestamp('2024-01-01') + pd.Timedelta(days=i), AccountInfo(total_assets=value))
+        online = (history.peak, history.max_drawdown)
+        history.refresh_drawdown()
+        assert online == (history.peak, history.max_drawdown), (online, history.max_drawdown)
+
+    assert history.max_drawdown == 0.0
+
+
+def test_return_stats_match_numpy_for_high_mean_returns():
+    """测试均值远大于波动的收益率序列，波动率与 np.std(ddof=1) 一致"""
+    print("=== 测试高均值收益率的波动率 ===")
+    rng = np.random.default_rng(4)
+    for returns in (0.01 + rng.normal(0, 1e-7, 500), np.full(500, 0.001) + 1e-18 * np.arange(500)):
+        equity = 1e6 * np.concatenate(([1.0], np.cumprod(1 + returns)))
+        history = [
+            {'timestamp': pd.Timestamp('2024-01-01') + pd.Timedelta(days=i), 'total_assets': value}
+            for i, value in enumerate(equity)
+        ]
+        analyzer = PerformanceAnalyzer(1e6, history, [])
+        daily = analyzer.calculate_daily_returns()
+        expected = np.std(daily, ddof=1) * np.sqrt(252)
+        assert abs(analyzer.calculate_return_volatility() - expected) <= 1e-12 * expected + 1e-18
+
+
+def test_account_history_timezone_aware_timestamps():
+    """测试带时区的时间戳按 UTC 存为无时区时间，逐条 record 与 from_records 一致且不告警"""
+    print("=== 测试带时区的时间戳 ===")
+    stamps = [pd.Timestamp('2024-01-02 09:00', tz='Asia/Shanghai'), datetime(2024, 1, 2, 1, 30)]
+    expected = np.array(['2024-01-02T01:00', '2024-01-02T01:30'], dtype='datetime64[ns]')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        history = AccountHistory()
+        for stamp in stamps:
+            history.record(stamp, AccountInfo(total_assets=1.0))
+        from_records = AccountHistory.from_records(
+            [{'timestamp': stamp, 'total_assets': 1.0} for stamp in stamps] + [{}]
+        )
+    assert (history.timestamp[:history.n] == expected).all()
+    assert (from_records.timestamp[:2] == expected).all()
+    assert np.isnat(from_records.timestamp[2])
+
+
+def run_all_tests():
+    """运行所有测试"""
+    print("开始测试分析模块...\n")
+    print("=" * 60)
+
+    tests = [
+        test_lttb_indices,
+        test_rolling_std_matches_pandas,
+        test_find_drawdown_periods_matches_loop,
+        test_account_history_drawdown_online_matches_refresh,
+        test_return_stats_match_numpy_for_high_mean_returns,
+        test_account_history_timezone_aware_timestamps,
+    ]
+
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+            print(f"{test_func.__name__:40} ✓ 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test_func.__name__:40} ✗ 失败: {e}")
+
+    print("=" * 60)
+    print("\n所有测试通过！✓" if failed == 0 else f"\n有 {failed} 个测试失败，请检查代码。")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,191 @@
+# test/test_engine.py
+import sys
+import os
+from concurrent.futures.process import BrokenProcessPool
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+import pandas as pd
+import core.engine
+from core.engine import BacktestEngine, _run_backtest_job
+from core.virtual_broker import TPlusOneRule
+from models.order import Order, OrderSide, OrderType
+from strategy.strategy import BaseStrategy
+
+
+def _target(close):
+    """只由收盘价决定的目标持仓（-3 ~ 3 手），包含加仓、减仓和反手"""
+    return np.floor(close) % 7 - 3
+
+
+class StatelessTargetStrategy(BaseStrategy):
+    """逐 bar 与向量化两种模式下目标一致的无状态策略"""
+    path_dependent = False
+
+    def on_bar(self, symbol, data):
+        delta = _target(data['close']) - self.broker.get_positions().get(symbol, 0.0)
+        if delta:
+            self.broker.place_order(Order(
+                symbol=symbol,
+                side=OrderSide.BUY if delta > 0 else OrderSide.SELL,
+                order_type=OrderType.MARKET,
+                quantity=abs(delta)
+            ))
+
+    def generate_signals(self, ohlcv):
+        # 缺失的 bar 收盘价为 NaN，目标也为 NaN（维持上一目标）
+        return _target(ohlcv[:, :, 3])
+
+
+def _make_data(seed=7, periods=300):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-01-01', periods=periods, freq='D')
+    data = {}
+    for symbol, start in (('RB0', 3500.0), ('AG0', 5000.0)):
+        close = start * np.exp(np.cumsum(rng.normal(0, 0.01, periods)))
+        df = pd.DataFrame({
+            'open': close, 'high': close * 1.01, 'low': close * 0.99,
+            'close': close, 'volume': 1000.0,
+        }, index=index)
+        if symbol == 'AG0':
+            df = df.drop(index[50:60])  # 品种间时间轴不完全对齐
+        data[symbol] = df
+    return data
+
+
+def _run(mode, data):
+    engine = BacktestEngine(10_000_000.0)
+    for symbol, df in data.items():
+        engine.add_data(symbol, df)
+    engine.add_strategy('stateless', StatelessTargetStrategy)
+    getattr(engine, mode)()
+    return engine
+
+
+def _trade_key(trade):
+    return (trade.trade_id, trade.symbol, trade.side, trade.quantity, trade.price,
+            trade.commission, trade.timestamp, trade.contract_value)
+
+
+def test_run_vectorized_matches_run():
+    """测试向量化回测与逐 bar 回测的账户历史、成交和期末持仓批次一致"""
+    print("=== 测试向量化回测与逐 bar 回测一致 ===")
+    data = _make_data()
+    event = _run('run', data)
+    vectorized = _run('run_vectorized', data)
+
+    history, vec_history = event.account_history, vectorized.account_history
+    assert len(history) == len(vec_history)
+    n = len(history)
+    assert (history.timestamp[:n] == vec_history.timestamp[:n]).all()
+    for name in history.FIELDS:
+        np.testing.assert_allclose(
+            getattr(vec_history, name)[:n], getattr(history, name)[:n], rtol=1e-12, atol=1e-6,
+            err_msg=name
+        )
+
+    trades = event.get_results()['trades']
+    vec_trades = vectorized.get_results()['trades']
+    print(f"成交笔数: {len(trades)}")
+    assert len(trades) > 0
+    assert [_trade_key(t) for t in trades] == [_trade_key(t) for t in vec_trades]
+
+    positions = event.get_results()['final_account'].positions
+    vec_positions = vectorized.get_results()['final_account'].positions
+    assert positions.keys() == vec_positions.keys()
+    for symbol, book in positions.items():
+        vec_book = vec_positions[symbol]
+        for column in ('quantity', 'entry_price', 'locked_margin'):
+            np.testing.assert_allclose(
+                getattr(vec_book, column)[:vec_book.n], getattr(book, column)[:book.n], rtol=1e-12
+            )
+
+
+def test_run_vectorized_falls_back_with_rules():
+    """测试注册了执行规则（如 T+1）时向量化回测退回逐 bar 回测"""
+    print("=== 测试有执行规则时退回 run() ===")
+    engine = BacktestEngine(10_000_000.0)
+    for symbol, df in _make_data(periods=60).items():
+        engine.add_data(symbol, df)
+    engine.add_strategy('stateless', StatelessTargetStrategy)
+    engine.add_rule(TPlusOneRule())
+    engine.run_vectorized()
+    # 只有逐 bar 路径经过经纪商下单，会留下订单记录
+    assert engine.get_results()['orders']
+
+
+def _parallel_configs():
+    return [
+        {'data': _make_data(seed=seed, periods=120), 'strategy': StatelessTargetStrategy,
+         'initial_capital': 10_000_000.0}
+        for seed in (1, 2, 3)
+    ]
+
+
+def test_run_parallel_matches_serial():
+    """测试并行回测与逐个串行回测的结果一致且顺序对应"""
+    print("=== 测试并行回测 ===")
+    configs = _parallel_configs()
+    expected = [_run_backtest_job(BacktestEngine, config) for config in configs]
+    np.testing.assert_equal(BacktestEngine.run_parallel(configs, workers=2), expected)
+
+
+def test_run_parallel_falls_back_to_serial():
+    """测试无法创建进程池或进程池损坏时退回串行执行"""
+    print("=== 测试并行回测退回串行 ===")
+    configs = _parallel_configs()
+    expected = [_run_backtest_job(BacktestEngine, config) for config in configs]
+
+    class NoProcessExecutor:
+        def __init__(self, *args, **kwargs):
+            raise OSError("无法创建子进程")
+
+    class BrokenExecutor:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def submit(self, *args, **kwargs):
+            raise BrokenProcessPool("子进程异常退出")
+
+    original = core.engine.ProcessPoolExecutor
+    try:
+        for executor in (NoProcessExecutor, BrokenExecutor):
+            core.engine.ProcessPoolExecutor = executor
+            np.testing.assert_equal(BacktestEngine.run_parallel(configs, workers=2), expected)
+    finally:
+        core.engine.ProcessPoolExecutor = original
+
+
+def run_all_tests():
+    """运行所有测试"""
+    print("开始测试 BacktestEngine...\n")
+    print("=" * 60)
+
+    tests = [
+        test_run_vectorized_matches_run,
+        test_run_vectorized_falls_back_with_rules,
+        test_run_parallel_matches_serial,
+        test_run_parallel_falls_back_to_serial,
+    ]
+
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+            print(f"{test_func.__name__:40} ✓ 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test_func.__name__:40} ✗ 失败: {e}")
+
+    print("=" * 60)
+    print("\n所有测试通过！✓" if failed == 0 else f"\n有 {failed} 个测试失败，请检查代码。")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,105 @@
+# test/test_run_with_engine.py
+import sys
+import os
+import contextlib
+import dataclasses
+import glob
+import io
+import json
+import tempfile
+import types
+import warnings
+from datetime import datetime
+from enum import Enum
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+import run_with_engine
+from core.engine import BacktestEngine
+from test_engine import StatelessTargetStrategy, _make_data
+
+
+def _fake_orjson_dumps(obj, default=None, option=0):
+    """按 orjson 的规则原生处理 dataclass / 枚举 / datetime / numpy，其余交给 default"""
+    def native(value):
+        if isinstance(value, Enum):
+            return value.value
+        if dataclasses.is_dataclass(value) and not isinstance(value, type):
+            return {f.name: getattr(value, f.name) for f in dataclasses.fields(value)}
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, (np.generic, np.ndarray)):
+            return value.tolist()
+        return default(value)
+    return json.dumps(obj, default=native, indent=2).encode()
+
+
+FAKE_ORJSON = types.SimpleNamespace(
+    dumps=_fake_orjson_dumps, OPT_SERIALIZE_NUMPY=1, OPT_NON_STR_KEYS=2, OPT_INDENT_2=4
+)
+
+
+def _save(results, orjson_module):
+    """以指定的 orjson 模块（None 表示未安装）保存结果，返回解析后的 JSON 与 CSV 文本"""
+    original = run_with_engine.orjson
+    run_with_engine.orjson = orjson_module
+    try:
+        with tempfile.TemporaryDirectory() as output_dir, warnings.catch_warnings(), \
+                contextlib.redirect_stdout(io.StringIO()):
+            warnings.simplefilter('ignore')
+            run_with_engine.save_results(results, output_dir, 10_000_000.0)
+            with open(glob.glob(os.path.join(output_dir, '*', '*.json'))[0], encoding='utf-8') as f:
+                saved = json.load(f)
+            with open(glob.glob(os.path.join(output_dir, '*', '*.csv'))[0], encoding='utf-8') as f:
+                csv_text = f.read()
+    finally:
+        run_with_engine.orjson = original
+    return saved, csv_text
+
+
+def test_save_results_orjson_matches_json():
+    """测试 orjson 与标准库 json 两条保存路径输出相同，枚举均输出取值，账户历史 CSV 与 to_csv 一致"""
+    print("=== 测试结果保存 ===")
+    engine = BacktestEngine(10_000_000.0)
+    for symbol, df in _make_data(periods=40).items():
+        engine.add_data(symbol, df)
+    engine.add_strategy('stateless', StatelessTargetStrategy)
+    engine.run()
+    results = engine.get_results()
+
+    with_orjson, _ = _save(results, FAKE_ORJSON)
+    with_json, csv_text = _save(results, None)
+    assert with_orjson == with_json
+    assert with_json['trades'][0]['side'] in ('buy', 'sell')
+    assert with_json['orders'][0]['status'] == 'filled'
+
+    # 账户历史 CSV 与 to_csv 的输出逐字一致
+    assert csv_text == results['account_history'].to_frame().to_csv(index=False)
+
+
+def run_all_tests():
+    """运行所有测试"""
+    print("开始测试 run_with_engine...\n")
+    print("=" * 60)
+
+    tests = [
+        test_save_results_orjson_matches_json,
+    ]
+
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+            print(f"{test_func.__name__:40} ✓ 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test_func.__name__:40} ✗ 失败: {e}")
+
+    print("=" * 60)
+    print("\n所有测试通过！✓" if failed == 0 else f"\n有 {failed} 个测试失败，请检查代码。")
+
+
+if __name__ == "__main__":
+    run_all_tests()
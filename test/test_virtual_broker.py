@@ -1,4 +1,5 @@
 # test/test_virtual_broker.py
+import copy
 from datetime import datetime
 import logging
 import sys
@@ -6,6 +7,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 import pandas as pd
+from account.account import Account
 from core.virtual_broker import VirtualBroker
 from models.order import Order, OrderSide, OrderStatus, OrderType
 
@@ -363,6 +365,154 @@ def test_after_realized_pnl_available_cash():
     print(f"预估可用现金: {expected_cash:.2f}")
     assert abs(account_info.cash - expected_cash) < 0.01
 
+def test_partial_close_multiple_lots():
+    """测试分批开仓后部分平仓（先开先平）"""
+    print("=== 测试分批开仓后部分平仓 ===")
+    broker = VirtualBroker(initial_capital=1000000.0)
+
+    def bar(close):
+        return pd.Series({
+            'open': close,
+            'high': close,
+            'low': close,
+            'close': close,
+            'volume': 10000
+        }, name=datetime.now())
+
+    broker.update_market_data("RB0", bar(3500.0))
+    for fill_price in (3500.0, 3600.0):
+        buy_order = Order(
+            symbol="RB0",
+            side=OrderSide.BUY,
+            order_type=OrderType.MARKET,
+            quantity=2
+        )
+        broker.place_order(buy_order)
+        broker.update_market_data("RB0", bar(fill_price))
+
+    lots = broker.get_account_info().positions["RB0"]
+    assert len(lots) == 2
+    assert lots[0].entry_price == 3500.0
+    assert lots[-1].entry_price == 3600.0
+
+    sell_order = Order(
+        symbol="RB0",
+        side=OrderSide.SELL,
+        order_type=OrderType.MARKET,
+        quantity=3
+    )
+    broker.place_order(sell_order)
+    broker.update_market_data("RB0", bar(3700.0))
+
+    config = broker.futures_config.get_config("RB0")
+    trading_unit = config['trading_unit']
+    account_info = broker.get_account_info()
+    lots = account_info.positions["RB0"]
+    print(f"剩余批次: {[(lot.quantity, lot.entry_price) for lot in lots]}")
+    assert len(lots) == 1
+    assert lots[0].quantity == 1
+    assert lots[0].entry_price == 3600.0
+    assert broker.get_positions() == {"RB0": 1}
+
+    expected_pnl = ((3700 - 3500) * 2 + (3700 - 3600) * 1) * trading_unit
+    assert abs(account_info.realized_pnl - expected_pnl) < 0.01
+    expected_margin = broker.futures_config.calculate_margin("RB0", 3600.0, 2) / 2
+    assert abs(broker.get_locked_cash() - expected_margin) < 0.01
+
+def test_match_orders_by_symbol():
+    """测试撮合只处理本品种挂单，已撤单不会成交"""
+    print("=== 测试按品种撮合 ===")
+
+    broker = VirtualBroker(initial_capital=1000000.0)
+
+    def bar(close):
+        return pd.Series({
+            'open': close,
+            'high': close,
+            'low': close,
+            'close': close,
+            'volume': 10000
+        }, name=datetime.now())
+
+    broker.update_market_data("RB0", bar(3500.0))
+    broker.update_market_data("AG0", bar(5000.0))
+
+    cancelled = Order(symbol="RB0", side=OrderSide.BUY, order_type=OrderType.MARKET, quantity=1)
+    other = Order(symbol="AG0", side=OrderSide.BUY, order_type=OrderType.MARKET, quantity=1)
+    broker.place_order(cancelled)
+    broker.place_order(other)
+    assert broker.cancel_order(cancelled.order_id)
+
+    broker.update_market_data("RB0", bar(3510.0))
+    assert cancelled.status == OrderStatus.CANCELLED
+    assert other.status == OrderStatus.SUBMITTED
+    assert "RB0" not in broker.get_positions()
+
+    broker.update_market_data("AG0", bar(5010.0))
+    assert other.status == OrderStatus.FILLED
+    assert broker.get_positions() == {"AG0": 1}
+
+    # 撤单按身份移出索引，不会误删字段完全相同的另一订单
+    limit = Order(symbol="AG0", side=OrderSide.BUY, order_type=OrderType.LIMIT, quantity=1, price=1.0)
+    broker.place_order(limit)
+    twin = copy.copy(limit)
+    broker.orders["twin"] = twin
+    assert broker.cancel_order("twin")
+    assert any(indexed is limit for indexed in broker._active_by_symbol["AG0"])
+    assert broker.cancel_order(limit.order_id)
+    assert not broker._active_by_symbol["AG0"]
+
+    # 未经 place_order 直接放入 orders 的活跃订单也能撤单
+    external = Order(symbol="MA0", side=OrderSide.BUY, order_type=OrderType.MARKET, quantity=1,
+                     status=OrderStatus.SUBMITTED)
+    broker.orders[external.order_id] = external
+    assert broker.cancel_order(external.order_id)
+    assert external.status == OrderStatus.CANCELLED
+
+def test_revalue_after_missing_price():
+    """测试持仓变动的 bar 没有价格时，之后以相同价格估值仍按新持仓计算"""
+    print("=== 测试缺失价格后的持仓估值 ===")
+    account = Account(initial_capital=1000000.0)
+    account.get_book("RB0").append(1, 3500.0, 10, 0.0)
+    account.mark_dirty("RB0")
+    info = account.get_info({"RB0": 3600.0})
+    assert info.market_value == 1 * 10 * 3600.0
+
+    # 成交（加仓）发生在该品种没有价格的 bar 上
+    account.get_book("RB0").append(1, 3600.0, 10, 0.0)
+    account.mark_dirty("RB0")
+    info = account.get_info({})
+    assert info.market_value == 0.0
+
+    # 下一根 bar 价格与缓存相同，仍需按 2 手重新估值
+    info = account.get_info({"RB0": 3600.0})
+    assert info.market_value == 2 * 10 * 3600.0
+    assert info.unrealized_pnl == (3600.0 - 3500.0) * 10
+
+
+def test_locked_cash_includes_unindexed_orders():
+    """测试未经 place_order 直接放入 orders 的活跃订单仍计入锁定保证金并参与撮合"""
+    print("=== 测试直接放入的挂单 ===")
+    broker = VirtualBroker(initial_capital=1000000.0)
+    broker.update_market_data("RB0", pd.Series({
+        'open': 3500.0, 'high': 3500.0, 'low': 3500.0, 'close': 3500.0, 'volume': 10000
+    }, name=datetime.now()))
+
+    placed = Order(symbol="RB0", side=OrderSide.BUY, order_type=OrderType.LIMIT, quantity=1, price=3000.0)
+    broker.place_order(placed)
+    external = Order(symbol="RB0", side=OrderSide.BUY, order_type=OrderType.LIMIT, quantity=1, price=3000.0,
+                     status=OrderStatus.SUBMITTED, required_margin=12345.0)
+    broker.orders[external.order_id] = external
+
+    assert abs(broker.get_locked_cash() - (placed.required_margin + 12345.0)) < 1e-9
+
+    broker.update_market_data("RB0", pd.Series({
+        'open': 2990.0, 'high': 2990.0, 'low': 2990.0, 'close': 2990.0, 'volume': 10000
+    }, name=datetime.now()))
+    assert placed.status == OrderStatus.FILLED
+    assert external.status == OrderStatus.FILLED
+
+
 def run_all_tests():
     """运行所有测试"""
     print("开始测试 VirtualBroker...\n")
@@ -375,6 +525,10 @@ def run_all_tests():
         test_after_buy_order_locked_cash,
         test_after_realized_pnl,
         test_after_realized_pnl_available_cash,
+        test_partial_close_multiple_lots,
+        test_match_orders_by_symbol,
+        test_revalue_after_missing_price,
+        test_locked_cash_includes_unindexed_orders,
     ]
 
     results = []